@@ -0,0 +1,182 @@
+"""
+Background solver thread and double-buffered snapshots for the UI.
+
+The solver runs headless in a worker thread. Instead of drawing, its render
+calls publish immutable snapshots (value function, policy arrows, agent position,
+walls, rewards and goal) into a SnapshotBuffer:
+    - the front slot holds the latest published snapshot, read by the UI;
+    - the back slot is the snapshot being copied by the solver, swapped in
+      under a lock (a reference swap, the UI never waits for a copy).
+The solver only copies a new snapshot once the UI has taken the previous one
+(or for the final frame), so a slow display costs it neither copies nor waits.
+The UI loop (display_snapshots) runs in the main thread, pumps the window
+events and draws the latest snapshot at its own frame rate.
+"""
+from collections import namedtuple
+import threading
+
+import numpy as np
+
+Snapshot = namedtuple("Snapshot", ["version", "v", "optimal_actions", "position", "walls", "goal", "final", "rewards"])
+
+
+def frozen_copy(array):
+    """
+    Returns a read-only copy of array (None stays None).
+    """
+    if array is None:
+        return None
+    array = np.array(array)
+    array.setflags(write=False)
+    return array
+
+
+class SnapshotBuffer():
+    def __init__(self):
+        """
+        Initialize an empty double buffer of snapshots.
+        """
+        self.lock = threading.Lock()
+        self.front = None
+        self.version = 0
+        self.consumed = True
+        self.skipped = 0  # publish calls dropped while the UI was busy
+
+    def wanted(self):
+        """
+        Returns True if the UI has taken the last snapshot (a new one is worth copying).
+        """
+        return self.consumed
+
+    def publish(self, v=None, optimal_actions=None, position=None, walls=None, goal=None, final=False, rewards=None):
+        """
+        Copies the solver state into the back slot and swaps it in. Skipped (returns False)
+        while the UI has not taken the previous snapshot, unless final is True.
+
+        Args:
+            v (array): value function (None if the solver has none)
+            optimal_actions (array): arrow names of every cell (None if the solver has none)
+            position (list): coords (X,Y) of the agent
+            walls (array): wall occupancy layer of the board in use
+            goal (list): coords (X,Y) of the goal
+            final (bool): True for the last frame of the run, always published
+            rewards (array): reward layer of the board in use (None if it has none)
+        """
+        if not final and not self.consumed:
+            self.skipped += 1
+            return False
+        back = Snapshot(
+            0, frozen_copy(v), frozen_copy(optimal_actions),
+            None if position is None else tuple(position),
+            frozen_copy(walls),
+            None if goal is None else tuple(goal),
+            final,
+            frozen_copy(rewards),
+        )
+        with self.lock:
+            self.version += 1
+            self.front = back._replace(version=self.version)
+            self.consumed = False
+        return True
+
+    def latest(self, since=0):
+        """
+        Returns the front snapshot if it is newer than version `since`, None otherwise.
+        """
+        with self.lock:
+            if self.front is None or self.front.version <= since:
+                return None
+            self.consumed = True
+            return self.front
+
+
+class BackgroundSolver():
+    def __init__(self, solve):
+        """
+        Runs a solver call in a daemon worker thread.
+
+        Args:
+            solve (callable): solver run without arguments, e.g. lambda: agent.value_iteration()
+        """
+        self.solve = solve
+        self.value = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="solver", daemon=True)
+
+    def run(self):
+        try:
+            self.value = self.solve()
+        except BaseException as error:
+            self.error = error
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def result(self):
+        """
+        Waits for the solver and returns its result (re-raises its exception).
+        """
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def draw_snapshot(board, snapshot):
+    """
+    Shows a snapshot on the board of the UI (only the changed tiles are redrawn).
+
+    Args:
+        board (Environment): gridworld environment drawn by the UI thread
+        snapshot (Snapshot): snapshot to show
+    """
+    if snapshot.walls is not None and not np.array_equal(snapshot.walls, board.walls):
+        board.change_the_wall(snapshot.walls)
+    if snapshot.rewards is not None:
+        board.update_rewards(snapshot.rewards)
+    if snapshot.goal is not None:
+        board.change_the_goal(snapshot.goal)
+    if snapshot.position is not None:
+        board.position = list(snapshot.position)
+    if snapshot.v is not None:
+        board.update_value_function(snapshot.v)
+    if snapshot.optimal_actions is not None:
+        board.update_optimal_actions(snapshot.optimal_actions)
+    board.draw()
+    board.refresh_display()
+
+
+def display_snapshots(board, buffer, solver, max_fps=30):
+    """
+    UI loop: pumps the window events and draws the latest snapshot, at most max_fps
+    times per second, until the solver is done and its last snapshot is shown.
+
+    Args:
+        board (Environment): gridworld environment with the window surface
+        buffer (SnapshotBuffer): snapshots published by the solver
+        solver (BackgroundSolver): the running solver
+        max_fps (float): maximum number of frames per second
+
+    Returns:
+        frames (int): number of snapshots drawn
+    """
+    import pygame
+
+    clock = pygame.time.Clock()
+    version = 0
+    frames = 0
+    while True:
+        board.handle_events()
+        finished = solver.done()  # read before the buffer, so the last snapshot is not missed
+        snapshot = buffer.latest(version)
+        if snapshot is not None:
+            version = snapshot.version
+            draw_snapshot(board, snapshot)
+            frames += 1
+        elif finished:
+            return frames
+        clock.tick(max_fps)
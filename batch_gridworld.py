@@ -0,0 +1,133 @@
+"""
+Headless, vectorized batch version of the Grid_World environment.
+
+We are assuming the same board semantics as Grid_World.step:
+    - actions are 0: Up, 1: Down, 2: Right, 3: Left;
+    - a move into a wall or outside the grid leaves the agent where it is;
+    - the reward is 1 when the agent stands on the goal, 0 otherwise.
+Agents are stored as StateSpace indices, so one step is a single lookup in
+the precomputed (S, A) next-state table.
+"""
+import numpy as np
+from state_space import StateSpace, default_wall_coords
+
+# Position offset (dx, dy) of each action
+ACTION_DELTAS = np.array([[-1, 0], [1, 0], [0, 1], [0, -1]])
+
+
+class BatchGridWorld():
+    def __init__(self, board_size=(10, 10), wall_coords=[], start_coord=(0, 3), goal_coord=(9, 9), num_envs=1, auto_reset=False, state_space=None):
+        """
+        Initialize N independent agents on the same Grid_World board.
+
+        Args:
+            board_size (tuple): (height, width) of the grid
+            wall_coords (list): list of [x, y] wall coords, or occupancy grid (same default wall as Grid_World when empty)
+            start_coord (tuple): Coordinates (X,Y) every agent starts from
+            goal_coord (tuple): Coordinates (X,Y) of the goal/target
+            num_envs (int): number N of agents stepped together
+            auto_reset (bool): send the agents that reached the goal back to the start after each step
+            state_space (StateSpace): indexing of the states (the non-wall cells of this board if None);
+                it may keep cells that are walls here, e.g. to share a Q-table across wall changes
+        """
+        self.board_size = list(board_size)
+        self.wall_coords = default_wall_coords(board_size, wall_coords)
+        self.start_coord = list(start_coord)
+        self.goal_coord = list(goal_coord)
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.actions = range(len(ACTION_DELTAS))
+
+        # Boolean occupancy grid: walls[x, y] is True when (x,y) is a wall
+        self.walls = StateSpace.wall_grid(self.board_size, self.wall_coords)
+        self.state_space = state_space if state_space is not None else StateSpace(self.board_size, self.walls)
+
+        self.next_state = self.get_next_state_table()
+        self.start_index = self.state_space.index[self.start_coord[0], self.start_coord[1]]
+        self.goal_index = self.state_space.index[self.goal_coord[0], self.goal_coord[1]]
+
+        self.state = np.empty(num_envs, dtype=np.int64)
+        self.reset()
+
+    @classmethod
+    def from_board(cls, board, num_envs=1, auto_reset=False, state_space=None):
+        """
+        Builds a batch environment sharing the layout of a Grid_World board.
+
+        Args:
+            board (Grid_World): gridworld environment
+            num_envs (int): number N of agents stepped together
+            auto_reset (bool): send the agents that reached the goal back to the start after each step
+            state_space (StateSpace): indexing of the states (the non-wall cells of the board if None)
+        """
+        return cls(board.board_size, board.walls, board.start_coord, board.goal_coord, num_envs, auto_reset, state_space)
+
+    def get_next_state_table(self):
+        """
+        Precomputes the next state of every (state, action), so that a step
+        never has to look at the walls.
+
+        Returns:
+            next_state (array): int array of shape (S, 4)
+        """
+        board_height, board_width = self.board_size
+        coords = self.state_space.coords
+        states = np.arange(self.state_space.num_states)
+        next_state = np.empty((self.state_space.num_states, len(ACTION_DELTAS)), dtype=np.int64)
+
+        for a, (dx, dy) in enumerate(ACTION_DELTAS):
+            target_x = coords[:, 0] + dx
+            target_y = coords[:, 1] + dy
+            inside = (target_x >= 0) & (target_x < board_height) & (target_y >= 0) & (target_y < board_width)
+            target_x = np.clip(target_x, 0, board_height - 1)
+            target_y = np.clip(target_y, 0, board_width - 1)
+            moved = inside & ~self.walls[target_x, target_y]
+            next_state[:, a] = np.where(moved, self.state_space.index[target_x, target_y], states)
+        return next_state
+
+    @property
+    def positions(self):
+        """
+        (N, 2) array of agent positions (X,Y).
+        """
+        return self.state_space.coords[self.state]
+
+    def reset(self, mask=None):
+        """
+        Sends agents back to the start coord.
+
+        Args:
+            mask (array): boolean array of shape (N,) selecting the agents to reset (all of them if None)
+
+        Returns:
+            state (array): (N,) array of agent states
+        """
+        if mask is None:
+            self.state[:] = self.start_index
+        else:
+            self.state[mask] = self.start_index
+        return self.state
+
+    def step(self, actions):
+        """
+        Advances all N agents by one action each.
+
+        Args:
+            actions (array): int array of shape (N,) with one action per agent
+
+        Returns:
+            state (array): (N,) array of the new agent states
+            rewards (array): (N,) array of rewards
+            dones (array): (N,) boolean array, True for agents that reached the goal
+        """
+        self.state = self.next_state[self.state, actions]
+
+        dones = self.state == self.goal_index
+        rewards = dones.astype(np.float64)
+
+        if self.auto_reset and dones.any():
+            # Return a copy so that callers still see the terminal states
+            state = self.state.copy()
+            self.reset(dones)
+            return state, rewards, dones
+        return self.state, rewards, dones
@@ -0,0 +1,302 @@
+"""
+Headless benchmark suite for the environment, DP and Q-learning hot paths.
+
+Measures, for every grid size and wall density:
+    - env_step: Grid_World.step and BatchGridWorld.step throughput (transitions per second);
+    - policy_evaluation: vectorized policy evaluation sweeps per second;
+    - policy_iteration: full PolicyIteration.policy_iteration time to convergence;
+    - q_learning: Q_learning episodes per second;
+    - q_learning_kernel: Q_learning.fast_q_learning episodes per second.
+
+With the "density" layout, the goal is the bottom-right cell of the board and
+walls are drawn at random (seeded) with the given density, keeping the goal
+reachable from the start; a density of 0 keeps the board's default wall. The other layouts are the seeded boards of maze_generator
+(perfect mazes, rooms and doors, random obstacles, corridors), with their own
+start and goal.
+Sizes are run in increasing order; a benchmark is skipped on a size when its
+time on the previous size (JIT compilation and warmup excluded), scaled by the
+number of cells, exceeds --budget.
+
+Usage:
+    python3 benchmarks.py --sizes 10 100 1000 --wall-densities 0 0.1 --output bench.json
+    python3 benchmarks.py --sizes 101 1001 --layouts maze rooms corridors --output bench.json
+    python3 benchmarks.py --compare old_bench.json bench.json
+"""
+from argparse import ArgumentParser
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from batch_gridworld import BatchGridWorld
+from episode_kernel import JIT_AVAILABLE, run_episodes
+from gridworld import Grid_World
+from maze_generator import LAYOUTS, generate
+from mdp import compile_mdp
+from policy_iteration import PolicyIteration
+from q_learner import Q_learning
+
+START_COORD = (0, 0)
+GOAL_COORD = (9, 9)  # Grid_World default goal (run() uses the bottom-right cell of each board)
+REWARD_GOAL = 10
+REWARD_WALL = -10
+REWARD_EMPTY = 0
+GAMMA = 0.9
+THETA = 0.01
+
+
+def reachable(board_size, wall_coords, start_coord, goal_coord):
+    """
+    Checks that the goal can be reached from the start (Grid_World.step semantics).
+    """
+    env = BatchGridWorld(board_size, wall_coords, start_coord, goal_coord)
+    visited = np.zeros(env.state_space.num_states, dtype=bool)
+    frontier = np.array([env.start_index])
+    visited[frontier] = True
+    while frontier.size:
+        targets = env.next_state[frontier].ravel()
+        frontier = np.unique(targets[~visited[targets]])
+        visited[frontier] = True
+    return visited[env.goal_index]
+
+
+def random_walls(board_size, wall_density, rng, start_coord=START_COORD, goal_coord=GOAL_COORD, max_tries=20):
+    """
+    Draws random wall coords with the given density, keeping start and goal free and connected.
+
+    Returns:
+        wall_coords (list): list of [x, y] wall coords ([] for the default wall)
+    """
+    if wall_density <= 0:
+        return []
+    for _ in range(max_tries):
+        walls = rng.random(board_size) < wall_density
+        walls[start_coord] = False
+        walls[goal_coord] = False
+        wall_coords = np.argwhere(walls).tolist()
+        if reachable(board_size, wall_coords, start_coord, goal_coord):
+            return wall_coords
+    raise RuntimeError(f"no connected board found for density {wall_density}")
+
+
+def bench_env_step(board_size, wall_coords, rng, start_coord=START_COORD, goal_coord=GOAL_COORD, num_steps=20000, num_envs=1000):
+    """
+    Transitions per second of Grid_World.step (one agent) and BatchGridWorld.step (num_envs agents).
+    """
+    board = Grid_World(None, board_size, wall_coords, start_coord, goal_coord)
+    actions = rng.integers(4, size=num_steps).tolist()
+    start = time.perf_counter()
+    for action in actions:
+        board.step(action)
+    single = num_steps / (time.perf_counter() - start)
+
+    env = BatchGridWorld.from_board(board, num_envs=num_envs, auto_reset=True)
+    batch_actions = rng.integers(4, size=(100, num_envs))
+    start = time.perf_counter()
+    for actions in batch_actions:
+        env.step(actions)
+    batch = batch_actions.size / (time.perf_counter() - start)
+
+    return {"grid_world_steps_per_s": single, "batch_steps_per_s": batch, "num_envs": num_envs}
+
+
+def make_policy_iteration(board_size, wall_coords, start_coord=START_COORD, goal_coord=GOAL_COORD):
+    return PolicyIteration(
+        surface=None, transition_timestep=float("inf"), board_size=board_size, start_coord=start_coord,
+        goal_coord=goal_coord, original_wall=wall_coords, new_wall=wall_coords, reward_goal=REWARD_GOAL,
+        reward_wall=REWARD_WALL, reward_empty=REWARD_EMPTY, pauseTime=0, v0_val=0, gamma=GAMMA, theta=THETA, seed=0,
+    )
+
+
+def bench_policy_evaluation(board_size, wall_coords, rng, start_coord=START_COORD, goal_coord=GOAL_COORD, num_sweeps=20):
+    """
+    Vectorized policy evaluation sweeps per second (equiprobable policy).
+    """
+    agent = make_policy_iteration(board_size, wall_coords, start_coord, goal_coord)
+    board = Grid_World(None, board_size, wall_coords, start_coord, goal_coord, REWARD_GOAL, REWARD_WALL, REWARD_EMPTY)
+    board.instanciate_rewards_list()
+    agent.mdp = compile_mdp(board)
+    v = agent.get_init_v(board_size[0], board_size[1], 0, board.goal_coord)
+    pi, _ = agent.get_equiprobable_policy(board_size[0], board_size[1], board.actions)
+
+    start = time.perf_counter()
+    for _ in range(num_sweeps):
+        agent.bellman_sweep(v, pi, GAMMA)
+    return {"sweeps_per_s": num_sweeps / (time.perf_counter() - start)}
+
+
+def bench_policy_iteration(board_size, wall_coords, rng, start_coord=START_COORD, goal_coord=GOAL_COORD):
+    """
+    Time to convergence of the full (headless) Policy Iteration.
+    """
+    agent = make_policy_iteration(board_size, wall_coords, start_coord, goal_coord)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.policy_iteration()
+    return {"seconds_to_convergence": time.perf_counter() - start}
+
+
+def bench_q_learning(board_size, wall_coords, rng, start_coord=START_COORD, goal_coord=GOAL_COORD, num_episodes=20):
+    """
+    Q-learning episodes per second (headless, files written to a temporary folder).
+    """
+    np.random.seed(int(rng.integers(2**31)))
+    agent = Q_learning(
+        alpha=0.5, gamma=0.95, epsilon=0.1, n=board_size[0] * board_size[1], num_episodes=num_episodes,
+        surface=None, board_size=board_size, start_coord=start_coord, original_wall=wall_coords,
+        new_wall=wall_coords, pauseTime=0, transition_timestep=float("inf"), goal_coord=goal_coord,
+    )
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.q_learning()
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {"episodes_per_s": num_episodes / elapsed}
+
+
+def bench_q_learning_kernel(board_size, wall_coords, rng, start_coord=START_COORD, goal_coord=GOAL_COORD, num_episodes=200):
+    """
+    Episode kernel Q-learning episodes per second (JIT compilation excluded, and reported
+    as warmup_s so that run() leaves it out of the budget estimate).
+    """
+    np.random.seed(int(rng.integers(2**31)))
+    agent = Q_learning(
+        alpha=0.5, gamma=0.95, epsilon=0.1, num_episodes=num_episodes, surface=None, board_size=board_size,
+        start_coord=start_coord, original_wall=wall_coords, new_wall=wall_coords, transition_timestep=float("inf"),
+        goal_coord=goal_coord,
+    )
+    env = BatchGridWorld(board_size, wall_coords, start_coord, goal_coord, state_space=agent.state_space)
+    # Compile (or load from cache) before timing
+    warmup_start = time.perf_counter()
+    run_episodes(agent.w.copy(), env.next_state, env.start_index, env.goal_index, env.start_index, 0.0, 0, 0.0,
+                 0.5, 0.95, np.full(1, 0.1), np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros(1),
+                 np.zeros(1, dtype=np.int64), np.zeros(1), 0)
+    warmup = time.perf_counter() - warmup_start
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.fast_q_learning()
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {"episodes_per_s": num_episodes / elapsed, "jit": JIT_AVAILABLE, "warmup_s": warmup}
+
+
+BENCHMARKS = {
+    "env_step": bench_env_step,
+    "policy_evaluation": bench_policy_evaluation,
+    "policy_iteration": bench_policy_iteration,
+    "q_learning": bench_q_learning,
+    "q_learning_kernel": bench_q_learning_kernel,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, wall_densities, benchmarks, budget, seed, layouts=("density",)):
+    """
+    Runs the benchmarks and returns the results as a JSON-serializable dict.
+    """
+    results = []
+    for name in benchmarks:
+        for layout, wall_density in [(layout, density) for layout in layouts for density in (wall_densities if layout == "density" else [None])]:
+            previous = None  # (cells, seconds) of the last run size
+            for size in sorted(sizes):
+                record = {"benchmark": name, "layout": layout, "size": size, "wall_density": wall_density}
+                cells = size * size
+                if previous is not None and previous[1] * cells / previous[0] > budget:
+                    record["skipped"] = f"estimated time above the {budget}s budget"
+                    results.append(record)
+                    print(record)
+                    continue
+
+                rng = np.random.default_rng(seed)
+                start = time.perf_counter()
+                if layout == "density":
+                    goal_coord = (size - 1, size - 1)
+                    walls = random_walls((size, size), wall_density, rng, START_COORD, goal_coord)
+                    record.update(BENCHMARKS[name]((size, size), walls, rng, START_COORD, goal_coord))
+                else:
+                    walls, start_coord, goal_coord = generate(layout, (size, size), seed)
+                    record["wall_density"] = round(float(walls.mean()), 4)
+                    record.update(BENCHMARKS[name]((size, size), walls, rng, start_coord, goal_coord))
+                record["elapsed_s"] = time.perf_counter() - start
+                # The one-off JIT compilation does not grow with the board
+                previous = (cells, record["elapsed_s"] - record.get("warmup_s", 0.0))
+                results.append(record)
+                print(record)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(old_path, new_path):
+    """
+    Prints the speedup of every metric measured in both result files (above 1 when the
+    new run is faster): new/old for the rates (*_per_s), old/new for the times.
+    """
+    with open(old_path) as f:
+        old = {(r["benchmark"], r.get("layout", "density"), r["size"], r["wall_density"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    for record in new:
+        key = (record["benchmark"], record.get("layout", "density"), record["size"], record["wall_density"])
+        if key not in old:
+            continue
+        for metric, value in record.items():
+            if metric.endswith("_per_s") or metric == "seconds_to_convergence":
+                old_value = old[key].get(metric)
+                if old_value and value:
+                    speedup = value / old_value if metric.endswith("_per_s") else old_value / value
+                    print(f"{key[0]:<18} {key[1]:<9} size={key[2]:<5} density={key[3]:<4} {metric:<24} {speedup:6.2f}x speedup")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 32, 100, 316, 1000], help="Grid sides (boards are size x size).")
+    parser.add_argument("--wall-densities", nargs="+", type=float, default=[0.0, 0.1, 0.3], help="Fractions of wall cells.")
+    parser.add_argument("--layouts", nargs="+", choices=["density"] + list(LAYOUTS), default=["density"], help="Board layouts: random walls of --wall-densities, or maze_generator layouts.")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS), help="Benchmarks to run.")
+    parser.add_argument("--budget", type=float, default=60.0, help="Skip a size when its estimated time exceeds BUDGET seconds.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the wall layouts and of the agents.")
+    parser.add_argument("--output", default="bench_results.json", help="Output JSON file.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files instead of running.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args.sizes, args.wall_densities, args.benchmarks, args.budget, args.seed, args.layouts)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
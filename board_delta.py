@@ -0,0 +1,40 @@
+"""
+Board deltas: the few cells that change on a Gridworld board between two plans.
+
+A delta lists the walls added or removed, the new goal and the reward overrides.
+Grid_World.apply_delta applies it in place (only the changed tiles are updated),
+and PolicyIteration.replan uses it to replan warm-started from the previous solution.
+"""
+import numpy as np
+
+from state_space import StateSpace, default_wall_coords
+
+
+class BoardDelta():
+    def __init__(self, add_walls=(), remove_walls=(), goal_coord=None, rewards=None):
+        """
+        Initialize a board delta.
+
+        Args:
+            add_walls (list): list of [x, y] coords of the new walls
+            remove_walls (list): list of [x, y] coords of the removed walls
+            goal_coord (tuple): new Coordinates (X,Y) of the goal (unchanged if None)
+            rewards (dict): {(x, y): reward} overrides of cell rewards (none if None)
+        """
+        self.add_walls = [list(coord) for coord in add_walls]
+        self.remove_walls = [list(coord) for coord in remove_walls]
+        self.goal_coord = list(goal_coord) if goal_coord is not None else None
+        self.rewards = {tuple(coord): reward for coord, reward in (rewards or {}).items()}
+
+    @classmethod
+    def between_walls(cls, board_size, old_walls, new_walls):
+        """
+        Delta from one wall layout to another (coord lists or occupancy grids, Grid_World
+        default wall if a list is empty), e.g. from original_wall to new_wall.
+        """
+        old_walls = StateSpace.wall_grid(board_size, default_wall_coords(board_size, old_walls))
+        new_walls = StateSpace.wall_grid(board_size, default_wall_coords(board_size, new_walls))
+        return cls(add_walls=np.argwhere(new_walls & ~old_walls).tolist(), remove_walls=np.argwhere(old_walls & ~new_walls).tolist())
+
+    def is_empty(self):
+        return not (self.add_walls or self.remove_walls or self.goal_coord is not None or self.rewards)
@@ -0,0 +1,147 @@
+"""
+Map files of Gridworld boards.
+
+A map gives the wall occupancy layer of a board (uint8, 1 for a wall), the start
+and the goal. Two formats are read, with no per-cell Python loop:
+    - ASCII art (.txt, .map): one line per row, "#" for a wall, "." or " " for an
+      empty cell, "S" for the start and "G" for the goal (short lines are padded
+      with empty cells);
+    - images (.png, .bmp, .jpg, ... read with pygame): one pixel per cell, dark
+      pixels are walls, the red pixel is the start and the green pixel the goal.
+Grid_World.from_map builds a board from a map file; save_map writes one (e.g.
+the boards of maze_generator).
+"""
+import os
+
+import numpy as np
+
+WALL = "#"
+EMPTY = ". "
+START = "S"
+GOAL = "G"
+ASCII_EXTENSIONS = (".txt", ".map")
+
+
+def find_cell(mask, name, path):
+    """
+    Returns the [x, y] coords of the only True cell of mask (ValueError otherwise).
+    """
+    cells = np.argwhere(mask)
+    if len(cells) != 1:
+        raise ValueError(f"{path}: expected one {name} cell, found {len(cells)}")
+    return cells[0].tolist()
+
+
+def parse_ascii_map(text, path="<map>"):
+    """
+    Parses an ASCII-art map.
+
+    Args:
+        text (str): map, one line per row of the board
+        path (str): name of the map in the error messages
+
+    Returns:
+        walls (array): uint8 occupancy layer of shape (height, width)
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    lines = text.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        raise ValueError(f"{path}: empty map")
+    width = max(len(line) for line in lines)
+    try:
+        cells = np.frombuffer("".join(line.ljust(width, EMPTY[0]) for line in lines).encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise ValueError(f"{path}: maps are ASCII only")
+    cells = cells.reshape(len(lines), width)
+
+    known = np.isin(cells, np.frombuffer((WALL + EMPTY + START + GOAL).encode("ascii"), dtype=np.uint8))
+    if not known.all():
+        x, y = np.argwhere(~known)[0].tolist()
+        raise ValueError(f"{path}: unknown cell {chr(cells[x, y])!r} at row {x}, column {y}")
+
+    walls = (cells == ord(WALL)).astype(np.uint8)
+    return walls, find_cell(cells == ord(START), "start", path), find_cell(cells == ord(GOAL), "goal", path)
+
+
+def load_ascii_map(path):
+    """
+    Reads an ASCII-art map file (see parse_ascii_map).
+    """
+    with open(path) as f:
+        return parse_ascii_map(f.read(), path)
+
+
+def load_image_map(path, threshold=128):
+    """
+    Reads an image map, one pixel per cell.
+
+    Args:
+        path (str): image file
+        threshold (int): pixels darker than this (mean of the channels) are walls
+
+    Returns:
+        walls (array): uint8 occupancy layer of shape (height, width)
+        start_coord (list): Coordinates [X,Y] of the (red) start pixel
+        goal_coord (list): Coordinates [X,Y] of the (green) goal pixel
+    """
+    import pygame
+
+    # pygame arrays are indexed [column, row]
+    pixels = pygame.surfarray.array3d(pygame.image.load(path)).transpose(1, 0, 2).astype(np.int16)
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    start = (red >= threshold) & (green < threshold) & (blue < threshold)
+    goal = (green >= threshold) & (red < threshold) & (blue < threshold)
+    walls = (pixels.mean(axis=2) < threshold) & ~start & ~goal
+    return walls.astype(np.uint8), find_cell(start, "start (red)", path), find_cell(goal, "goal (green)", path)
+
+
+def format_ascii_map(walls, start_coord, goal_coord):
+    """
+    Returns the ASCII art of a board (the inverse of parse_ascii_map).
+    """
+    cells = np.where(np.asarray(walls, dtype=bool), ord(WALL), ord(EMPTY[0])).astype(np.uint8)
+    cells[start_coord[0], start_coord[1]] = ord(START)
+    cells[goal_coord[0], goal_coord[1]] = ord(GOAL)
+    lines = np.concatenate([cells, np.full((len(cells), 1), ord("\n"), dtype=np.uint8)], axis=1)
+    return lines.tobytes().decode("ascii")
+
+
+def save_map(path, walls, start_coord, goal_coord):
+    """
+    Writes a map file, ASCII art or image (black walls, red start, green goal) depending
+    on its extension.
+
+    Args:
+        path (str): map file
+        walls (array): occupancy layer of shape (height, width)
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    if os.path.splitext(path)[1].lower() in ASCII_EXTENSIONS:
+        with open(path, "w") as f:
+            f.write(format_ascii_map(walls, start_coord, goal_coord))
+        return
+    import pygame
+
+    pixels = np.where(np.asarray(walls, dtype=bool)[..., None], 0, 255).astype(np.uint8).repeat(3, axis=2)
+    pixels[start_coord[0], start_coord[1]] = (255, 0, 0)
+    pixels[goal_coord[0], goal_coord[1]] = (0, 255, 0)
+    # pygame arrays are indexed [column, row]
+    pygame.image.save(pygame.surfarray.make_surface(pixels.transpose(1, 0, 2)), path)
+
+
+def load_map(path):
+    """
+    Reads a map file, ASCII art or image depending on its extension.
+
+    Returns:
+        walls (array): uint8 occupancy layer of shape (height, width)
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    if os.path.splitext(path)[1].lower() in ASCII_EXTENSIONS:
+        return load_ascii_map(path)
+    return load_image_map(path)
@@ -0,0 +1,96 @@
+"""
+Memory-mappable checkpoints of the solver state.
+
+A checkpoint is a directory holding:
+    - one .npy file per table (value function, policy, Q-table, ...), that
+      np.load(..., mmap_mode="r") maps without reading the whole file;
+    - meta.json with the counters (episode, sweep, timesteps, ...), the settings
+      and the NumPy global RNG state (its key array is stored as rng_keys.npy).
+A checkpoint is written in a temporary directory first and then swapped in, so a
+job preempted while saving still finds the previous complete checkpoint.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+META_FILE = "meta.json"
+RNG_KEYS = "rng_keys"
+
+
+def save_checkpoint(path, arrays, meta, save_rng=True):
+    """
+    Writes a checkpoint directory, replacing the previous one at path.
+
+    Args:
+        path (str): checkpoint directory
+        arrays (dict): {name: array} tables, one .npy file each
+        meta (dict): JSON-serializable counters and settings
+        save_rng (bool): also save the NumPy global RNG state
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    meta = dict(meta)
+    arrays = dict(arrays)
+    if save_rng:
+        name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+        arrays[RNG_KEYS] = keys
+        meta["rng"] = {"name": name, "pos": int(pos), "has_gauss": int(has_gauss), "cached_gaussian": float(cached_gaussian)}
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, name + ".npy"), np.asarray(array))
+    meta["arrays"] = sorted(arrays)
+    with open(os.path.join(tmp_path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the new checkpoint in
+    old_path = path + ".old"
+    if os.path.exists(os.path.join(path, META_FILE)):
+        # The current checkpoint is complete: drop the .old one left by a save
+        # preempted before its cleanup, so the rename below cannot fail
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+    elif os.path.exists(path):
+        # Incomplete checkpoint: the .old one (if any) stays the good copy
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def load_checkpoint(path, mmap=True, restore_rng=True):
+    """
+    Opens a checkpoint directory.
+
+    Args:
+        path (str): checkpoint directory
+        mmap (bool): memory-map the tables (read-only) instead of reading them
+        restore_rng (bool): restore the NumPy global RNG state, if it was saved
+
+    Returns:
+        arrays (dict): {name: array} tables
+        meta (dict): counters and settings
+    """
+    if not os.path.exists(os.path.join(path, META_FILE)) and os.path.exists(path + ".old"):
+        path = path + ".old"  # preempted between the two renames of save_checkpoint
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for name in meta["arrays"]
+    }
+    keys = arrays.pop(RNG_KEYS, None)
+    if restore_rng and keys is not None:
+        rng = meta["rng"]
+        np.random.set_state((rng["name"], np.array(keys), rng["pos"], rng["has_gauss"], rng["cached_gaussian"]))
+    return arrays, meta
+
+
+def checkpoint_exists(path):
+    return os.path.exists(os.path.join(path, META_FILE)) or os.path.exists(os.path.join(path + ".old", META_FILE))
@@ -0,0 +1,72 @@
+# Early stopping of Q-learning
+#
+# Training is over when the greedy policy extracted from the Q-table has
+# not changed for `patience` consecutive checks, or when the largest TD
+# error of the last checked episodes is under `td_error`. The Q-learners
+# only consult it when no wall change is pending.
+
+import numpy as np
+
+
+class EarlyStopping:
+    # An object in this class watches the Q-table between episodes.
+
+    def __init__(self, patience=None, td_error=None, check_every=1):
+        # Initialize the stopping rule.
+        # - patience is the number K of consecutive checks with an
+        #   unchanged greedy policy that ends training (None to disable)
+        # - td_error is the max |TD error| under which training ends
+        #   (None to disable)
+        # - check_every is the number of episodes between two checks
+        self.patience = patience
+        self.td_error = td_error
+        self.check_every = check_every
+        self.reset()
+
+    @property
+    def enabled(self):
+        return self.patience is not None or self.td_error is not None
+
+    def reset(self):
+        # Forget the previous checks (e.g. after a wall change).
+        self.policy = None
+        self.stable_checks = 0
+        self.max_td_error = 0.0
+        self.episodes = 0
+
+    def state(self):
+        # Return the checks so far, for checkpoints: a JSON-serializable
+        # dict of the counters and the last checked greedy policy (None
+        # before the first check).
+        counters = {"stable_checks": self.stable_checks, "max_td_error": float(self.max_td_error), "episodes": self.episodes}
+        return counters, self.policy
+
+    def restore(self, counters, policy):
+        # Resume the checks from what state() returned.
+        self.stable_checks = counters["stable_checks"]
+        self.max_td_error = counters["max_td_error"]
+        self.episodes = counters["episodes"]
+        self.policy = None if policy is None else np.array(policy)
+
+    def update(self, w, max_td_error, episodes=1):
+        # Record finished episodes and their max |TD error|, and return
+        # True when training should stop. The policy is checked at most
+        # once per call.
+        # - w is the (S, A) Q-table
+        # - episodes is the number of episodes finished since the last call
+        previous_checks = self.episodes // self.check_every
+        self.episodes += episodes
+        self.max_td_error = max(self.max_td_error, max_td_error)
+        if not self.enabled or self.episodes // self.check_every == previous_checks:
+            return False
+
+        policy = np.argmax(w, axis=1)
+        if self.policy is not None and np.array_equal(policy, self.policy):
+            self.stable_checks += 1
+        else:
+            self.stable_checks = 0
+        self.policy = policy
+
+        converged = self.td_error is not None and self.max_td_error < self.td_error
+        self.max_td_error = 0.0
+        return converged or (self.patience is not None and self.stable_checks >= self.patience)
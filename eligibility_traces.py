@@ -0,0 +1,65 @@
+# Sparse eligibility traces
+#
+# Only the recently visited (state, action) pairs have a non-negligible
+# trace: after k steps a trace is at most (gamma * lambda)^k times its
+# value. The traces are kept in a bounded ordered dictionary (oldest
+# first) and dropped once they fall under a cutoff, so a Q(lambda)
+# update costs time proportional to the active traces instead of the
+# whole Q-table.
+
+from collections import OrderedDict
+import math
+
+
+class SparseTraces:
+    # An object in this class holds the active eligibility traces of a
+    # tabular Q(lambda) learner.
+
+    def __init__(self, decay, replacing=True, cutoff=1e-3, max_size=None):
+        # Initialize an empty trace set.
+        # - decay is gamma * lambda, applied to every trace after each update
+        # - replacing traces are reset to 1 on a visit, accumulating ones
+        #   are incremented by 1
+        # - cutoff is the trace value under which a trace is dropped
+        # - max_size is the number of traces kept before the oldest one is
+        #   evicted (by default, the number of steps for a trace of 1 to
+        #   decay under the cutoff)
+        self.decay = decay
+        self.replacing = replacing
+        self.cutoff = cutoff
+        if max_size is None:
+            if 0 < decay < 1:
+                max_size = math.ceil(math.log(cutoff) / math.log(decay)) + 1
+            else:
+                max_size = 1
+        self.max_size = max_size
+        self.traces = OrderedDict()
+
+    def __len__(self):
+        return len(self.traces)
+
+    def clear(self):
+        # Cut all the traces (Watkins Q(lambda), after an exploratory action).
+        self.traces.clear()
+
+    def visit(self, features, action):
+        # Mark the pair (features, action) as just visited.
+        key = (features, action)
+        trace = self.traces.pop(key, 0.0)
+        self.traces[key] = 1.0 if self.replacing else trace + 1.0
+        if len(self.traces) > self.max_size:
+            self.traces.popitem(last=False)
+
+    def update(self, w, step):
+        # Apply w[s, a] += step * e(s, a) to every active pair, then decay
+        # the traces and drop the ones under the cutoff.
+        dropped = []
+        for key, trace in self.traces.items():
+            w[key] += step * trace
+            trace *= self.decay
+            if trace < self.cutoff:
+                dropped.append(key)
+            else:
+                self.traces[key] = trace
+        for key in dropped:
+            del self.traces[key]
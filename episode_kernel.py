@@ -0,0 +1,103 @@
+"""
+Whole-episode tabular Q-learning kernel over flat arrays (JIT-compiled with numba when available).
+
+We are assuming the same learning dynamics as Q_learning.q_learning:
+    - states are StateSpace indices and next_state is the (S, A) table of BatchGridWorld;
+    - the action is random when all the Q-values of the state are equal, or with
+      probability epsilon (one value per episode), greedy (argmax) otherwise;
+    - the reward is 1 when the agent reaches the goal, 0 otherwise;
+    - one TD update w[s, a] += alpha * (r + gamma * max(w[s']) - w[s, a]) per step;
+    - an episode ends on the goal and the next one starts from the start state.
+The random draws are made by the caller with np.random, one block at a time, so
+that the JIT and the pure NumPy backends consume the same random stream.
+"""
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT_AVAILABLE = numba is not None
+
+
+def run_episodes_numpy(w, next_state, start_state, goal_state, state, episode_return, episode_length, episode_td_error,
+                       alpha, gamma, epsilons, explore_draws, action_draws, returns, lengths, td_errors, num_done):
+    """
+    Runs Q-learning steps until the random draws run out or len(returns) episodes are done.
+
+    Args:
+        w (array): (S, A) Q-table, updated in place
+        next_state (array): (S, A) next-state table
+        start_state (int): state every episode starts from
+        goal_state (int): terminal state
+        state (int): current state (resumes an episode cut by the previous block)
+        episode_return (float): return of the current episode so far
+        episode_length (int): number of steps of the current episode so far
+        episode_td_error (float): max |TD error| of the current episode so far
+        alpha (float): learning rate
+        gamma (float): discount factor
+        epsilons (array): exploration rate of every episode
+        explore_draws (array): uniform draws in [0, 1), one per step
+        action_draws (array): random actions, one per step
+        returns (array): per-episode returns, filled from index num_done
+        lengths (array): per-episode lengths, filled from index num_done
+        td_errors (array): per-episode max |TD error|, filled from index num_done
+        num_done (int): number of episodes already done
+
+    Returns:
+        num_done (int): number of episodes done
+        num_steps (int): number of draws used
+        state (int), episode_return (float), episode_length (int), episode_td_error (float): current episode
+    """
+    num_actions = w.shape[1]
+    num_steps = 0
+    for k in range(explore_draws.shape[0]):
+        if num_done >= returns.shape[0]:
+            break
+
+        # Epsilon-greedy action, random on ties (as greedy_Q)
+        best = 0
+        tie = True
+        for a in range(1, num_actions):
+            if w[state, a] != w[state, 0]:
+                tie = False
+            if w[state, a] > w[state, best]:
+                best = a
+        if tie or explore_draws[k] < epsilons[num_done]:
+            action = action_draws[k]
+        else:
+            action = best
+
+        # Transition and TD update
+        next_s = next_state[state, action]
+        reward = 1.0 if next_s == goal_state else 0.0
+        max_next = w[next_s, 0]
+        for a in range(1, num_actions):
+            if w[next_s, a] > max_next:
+                max_next = w[next_s, a]
+        delta = reward + gamma * max_next - w[state, action]
+        w[state, action] += alpha * delta
+        episode_td_error = max(episode_td_error, abs(delta))
+
+        episode_return += reward
+        episode_length += 1
+        num_steps += 1
+
+        if next_s == goal_state:
+            returns[num_done] = episode_return
+            lengths[num_done] = episode_length
+            td_errors[num_done] = episode_td_error
+            num_done += 1
+            state = start_state
+            episode_return = 0.0
+            episode_length = 0
+            episode_td_error = 0.0
+        else:
+            state = next_s
+    return num_done, num_steps, state, episode_return, episode_length, episode_td_error
+
+
+# JIT-compiled kernel, or the pure NumPy one when numba is not installed
+if JIT_AVAILABLE:
+    run_episodes = numba.njit(cache=True)(run_episodes_numpy)
+else:
+    run_episodes = run_episodes_numpy
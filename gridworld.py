@@ -1,9 +1,40 @@
 # Grid_World
+#
+# pygame is only imported when a board is drawn, so the environment can be
+# imported and stepped headless (surface=None) without it.
 
-import pygame
+import os
 import sys, time, random
-from pygame.locals import *
 import numpy as np
+from render_cache import TextCache
+from state_space import StateSpace, default_wall_coords
+
+# Absolute path of the images folder, so that assets load from any working directory
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Tile class attribute -> image file (relative to IMAGE_DIR)
+TILE_ASSETS = {
+    "image": "satellite.png",
+    # if only 1 best action
+    "left_arrow": "arrows/left_arrow.png",
+    "right_arrow": "arrows/right_arrow.png",
+    "up_arrow": "arrows/up_arrow.png",
+    "down_arrow": "arrows/down_arrow.png",
+    # if 2 best actions
+    "left_up_arrow": "arrows/left_up_arrow.png",
+    "left_right_arrow": "arrows/left_right_arrow.png",
+    "left_down_arrow": "arrows/left_down_arrow.png",
+    "up_right_arrow": "arrows/up_right_arrow.png",
+    "up_down_arrow": "arrows/up_down_arrow.png",
+    "down_right_arrow": "arrows/right_down_arrow.png",
+    # if 3 best actions
+    "up_down_right_arrow": "arrows/up_down_right_arrow.png",
+    "up_down_left_arrow": "arrows/up_down_left_arrow.png",
+    "down_left_right_arrow": "arrows/left_right_down_arrow.png",
+    "left_right_up_arrow": "arrows/left_right_up_arrow.png",
+    # if 4 best actions
+    "all_arrows": "arrows/all_arrows.png",
+}
 
 # action_dict = {
 #     "0": "Up",
@@ -22,34 +53,25 @@ class Tile:
     # initialize the class attributes that are common to all
     # tiles.
 
-    borderColor = pygame.Color("black")
+    borderColor = "black"
     borderWidth = 1  # the pixel width of the tile border
-    image = pygame.image.load("./images/satellite.png")
+    detail_size = 60  # smaller tiles (large boards) only show their colors
 
-    #Arrows
-    # if only 1 best action
-    left_arrow = pygame.image.load("./images/arrows/left_arrow.png")
-    right_arrow = pygame.image.load("./images/arrows/right_arrow.png")
-    up_arrow = pygame.image.load("./images/arrows/up_arrow.png")
-    down_arrow = pygame.image.load("./images/arrows/down_arrow.png")
+    # The satellite image and the arrows (see TILE_ASSETS) are loaded
+    # once, on the first draw
+    assets_loaded = False
 
-    # if 2 best actions
-    left_up_arrow = pygame.image.load("./images/arrows/left_up_arrow.png")
-    left_right_arrow = pygame.image.load("./images/arrows/left_right_arrow.png")
-    left_down_arrow = pygame.image.load("./images/arrows/left_down_arrow.png")
-    up_right_arrow = pygame.image.load("./images/arrows/up_right_arrow.png")
-    up_down_arrow = pygame.image.load("./images/arrows/up_down_arrow.png")
-    down_right_arrow = pygame.image.load("./images/arrows/right_down_arrow.png")
-
-    #if 3 best actions
-    up_down_right_arrow = pygame.image.load("./images/arrows/up_down_right_arrow.png")
-    up_down_left_arrow = pygame.image.load("./images/arrows/up_down_left_arrow.png")
-    down_left_right_arrow = pygame.image.load("./images/arrows/left_right_down_arrow.png")
-    left_right_up_arrow = pygame.image.load("./images/arrows/left_right_up_arrow.png")
+    # Fonts and rendered value/reward texts, shared by all tiles
+    text_cache = TextCache()
 
-    # if 4 best actions
-    all_arrows  = pygame.image.load("./images/arrows/all_arrows.png")
+    @classmethod
+    def load_assets(cls):
+        # Load the images shared by all tiles
+        import pygame
 
+        for name, file_name in TILE_ASSETS.items():
+            setattr(cls, name, pygame.image.load(os.path.join(IMAGE_DIR, file_name)))
+        cls.assets_loaded = True
 
     def __init__(self, x, y, wall, surface,value_function_nb,policy_arrow,reward, tile_size=(60, 60)):
         # Initialize a tile to contain an image
@@ -61,7 +83,7 @@ class Tile:
 
         self.wall = wall
         self.origin = (x, y)
-        self.tile_coord = [ x // 60, y // 60]
+        self.tile_coord = [ y // tile_size[1], x // tile_size[0]]  # [row, column], like board positions
         self.surface = surface
         self.tile_size = tile_size
         self.value_function_nb = value_function_nb
@@ -70,6 +92,7 @@ class Tile:
 
     def draw(self, pos, goal,value_function,policy):
         # Draw the tile.
+        import pygame
 
         rectangle = pygame.Rect(self.origin, self.tile_size)
         if self.wall:
@@ -79,26 +102,32 @@ class Tile:
         else:
             pygame.draw.rect(self.surface, pygame.Color("white"), rectangle, 0)
 
+        # The texts and images do not fit in small tiles: the agent is a blue tile
+        if min(self.tile_size) < Tile.detail_size:
+            if pos == self.tile_coord:
+                pygame.draw.rect(self.surface, pygame.Color("blue"), rectangle, 0)
+            return
+
+        if not Tile.assets_loaded:
+            Tile.load_assets()
+
         if pos == self.tile_coord:
             self.surface.blit(Tile.image, self.origin)
 
-        font  = pygame.font.SysFont( None, 20 )                # Default font, Size 20
-        font_reward  = pygame.font.SysFont( None, 17 )                # Default font, Size 20
-        
         # Color scale for Value function
         # pct_diff = 0.0 + np.log(abs(round(self.value_function_nb,2)))
         # red_color = min(255, pct_diff*2 * 255)
         # green_color = min(255, round(self.value_function_nb,2)*2 * 255)
         # col = (red_color, green_color, 0)
-        value_function_image = font.render(str(round(self.value_function_nb,2)), True, pygame.Color("black"))  # Number assigned as Value function
+        value_function_image = Tile.text_cache.render(str(round(self.value_function_nb,2)), "black", 20)  # Number assigned as Value function
         policy_arrow = self.policy_arrow
 
         if self.reward > 0:
-            reward_image = font_reward.render(str(round(self.reward,1)),True,pygame.Color("blue"))
+            reward_image = Tile.text_cache.render(str(round(self.reward,1)), "blue", 17)
         elif self.reward < 0:
-            reward_image = font_reward.render(str(round(self.reward,1)),True,pygame.Color("red"))
+            reward_image = Tile.text_cache.render(str(round(self.reward,1)), "red", 17)
         else:
-            reward_image = font_reward.render(str(round(self.reward,1)),True,pygame.Color("black"))
+            reward_image = Tile.text_cache.render(str(round(self.reward,1)), "black", 17)
 
         # centre the VALUE FUNCTION image in the cell by calculating the margin-distance
         margin_x_value = ( self.tile_size[0]-1 - value_function_image.get_width() ) // 2
@@ -174,18 +203,24 @@ class Grid_World:
         reward_empty = 0
     ):
         # Intialize a Grid_World game.
-        # - surface is the pygame.Surface of the window
+        # - surface is the pygame.Surface of the window, or None to
+        #   run headless (nothing is drawn and pygame is never imported)
+        # - wall_coords is a list of [x, y] wall coords, or an occupancy
+        #   grid of shape board_size (bool or uint8)
+        # The board is stored as NumPy layers: walls (uint8, 1 for a wall),
+        # rewards_list (float reward of each cell, see
+        # instanciate_rewards_list) and terminal (bool, the goal). The
+        # Tiles are only derived from the layers when first drawn.
 
         self.surface = surface
-        self.bgColor = pygame.Color("black")
+        self.bgColor = "black"
         self.board_size = list(board_size)
-        if not wall_coords:
-            self.wall_coords = [[2, i] for i in range(board_size[1] - 1)]
-        else:
-            self.wall_coords = wall_coords
+        self.walls = StateSpace.wall_grid(self.board_size, default_wall_coords(board_size, wall_coords)).astype(np.uint8)
 
         self.start_coord = list(start_coord)
         self.goal_coord = list(goal_coord)
+        self.terminal = np.zeros(self.board_size, dtype=bool)
+        self.change_the_goal(goal_coord)
         self.position = list(start_coord)
         self.actions = range(4)
         self.rewards_list = []
@@ -193,66 +228,185 @@ class Grid_World:
         self.reward_goal = reward_goal
         self.reward_wall =  reward_wall
         self.reward_empty = reward_empty
+        self.reward_overrides = {}  # {(x, y): reward} set by apply_delta
+
+        self.tiles = None
+        self.resetDrawState()
+
+    @classmethod
+    def from_map(cls, surface, path, reward_goal=1, reward_wall=-1, reward_empty=0):
+        # Build a Grid_World from an ASCII-art or image map file (see
+        # board_maps), which gives the size, walls, start and goal.
+        from board_maps import load_map
 
-        self.calc_wall_coords()
-        self.createTiles()
+        walls, start_coord, goal_coord = load_map(path)
+        return cls(surface, walls.shape, walls, start_coord, goal_coord, reward_goal, reward_wall, reward_empty)
 
-    def calc_wall_coords(self):
-        self.board_wall_coords = [
-            [x, y] for x, y in self.wall_coords
-         ]
+    @property
+    def wall_coords(self):
+        # List of the [x, y] wall coords, derived from the walls layer
+        return np.argwhere(self.walls).tolist()
+
+    @property
+    def board(self):
+        # The Tiles (rows of columns), created on first use: headless
+        # runs never need them
+        if self.tiles is None:
+            self.createTiles()
+        return self.tiles
 
     def instanciate_rewards_list(self):
-        self.rewards_list = (self.reward_empty) * np.ones((self.board_size[0], self.board_size[1]))
-        self.rewards_list[self.goal_coord[0],self.goal_coord[1]] = self.reward_goal
-        for i in self.wall_coords:
-            self.rewards_list[i[0],i[1]] = self.reward_wall
-        for x,row in enumerate(self.board):
-                for y,tile in enumerate(row):
-                    tile.reward =  self.rewards_list[x,y]
+        # Build the reward layer: reward_empty everywhere, reward_goal on
+        # the goal, reward_wall on the walls, then the overrides
+        rewards = np.full(self.board_size, self.reward_empty, dtype=np.float64)
+        rewards[self.goal_coord[0],self.goal_coord[1]] = self.reward_goal
+        rewards[self.walls.astype(bool)] = self.reward_wall
+        for (x, y), reward in self.reward_overrides.items():
+            rewards[x, y] = reward
+        self.update_rewards(rewards)
+
+    def update_rewards(self, rewards):
+        # Replace the reward layer (e.g. by the one of a snapshot); only
+        # the existing tiles whose reward changed are updated
+        self.rewards_list = rewards
+        if self.tiles is not None:
+            xs, ys = np.nonzero(rewards != self.shown_rewards)
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                self.tiles[x][y].reward = rewards[x, y]
+                self.dirty_tiles.add((x, y))
+            self.shown_rewards = rewards.copy()
 
     def find_board_coords(self, pos):
         x = pos[0]
         y = pos[1]
         return [x, y]
 
+    def fit_tile_size(self):
+        # Side of the tiles in pixels: tile_width x tile_height, shrunk
+        # (square) when the board does not fit in the window (headless
+        # boards keep the default size)
+        if self.surface is None:
+            return (Grid_World.tile_width, Grid_World.tile_height)
+        width, height = self.surface.get_size()
+        side = min(width // self.board_size[1], height // self.board_size[0])
+        if side >= Grid_World.tile_width and side >= Grid_World.tile_height:
+            return (Grid_World.tile_width, Grid_World.tile_height)
+        if side < 1:
+            raise ValueError(f"a {self.board_size[0]}x{self.board_size[1]} board does not fit in a {width}x{height} window")
+        return (side, side)
+
     def createTiles(self):
-        # Create the Tiles
+        # Create the Tiles from the layers (walls and rewards)
         # - self is the Grid_World game
-        self.board = []
+        walls = self.walls.astype(bool).tolist()
+        if len(self.rewards_list):
+            rewards = self.rewards_list.tolist()
+            self.shown_rewards = self.rewards_list.copy()
+        else:
+            rewards = np.zeros(self.board_size).tolist()
+            self.shown_rewards = np.zeros(self.board_size)
+        tile_size = self.fit_tile_size()
+        self.tiles = []
         for rowIndex in range(0, self.board_size[0]):
             row = []
             for columnIndex in range(0, self.board_size[1]):
                 #imageIndex = rowIndex * self.board_size[1] + columnIndex
-                x = columnIndex * Grid_World.tile_width
-                y = rowIndex * Grid_World.tile_height
-                if [rowIndex, columnIndex] in self.board_wall_coords:
-                    wall = True
-                else:
-                    wall = False
-                tile = Tile(x, y, wall, self.surface,0,"all_arrows",0,)
+                x = columnIndex * tile_size[0]
+                y = rowIndex * tile_size[1]
+                tile = Tile(x, y, walls[rowIndex][columnIndex], self.surface,0,"all_arrows",rewards[rowIndex][columnIndex],tile_size)
                 row.append(tile)
-            self.board.append(row)
+            self.tiles.append(row)
+        self.resetDrawState()
+
+    def resetDrawState(self):
+        # Change tracking: the (x, y) of the tiles to redraw on the next
+        # draw, and what the tiles currently show. New tiles are all drawn.
+        self.full_redraw = True
+        self.dirty_tiles = set()
+        self.dirty_rects = []
+        self.shown_values = np.zeros(self.board_size)
+        self.shown_arrows = np.full(self.board_size, "all_arrows", dtype=object)
+        self.shown_position = None
+        self.shown_goal = None
 
     def update_value_function(self,value_function_array):
-        for x,row in enumerate(self.board):
-                for y,tile in enumerate(row):
-                    tile.value_function_nb =  value_function_array[x,y]
+        # Only the tiles whose displayed (rounded) value changes are updated
+        # (nothing to show when headless: no tiles are created)
+        if self.surface is None:
+            return
+        rounded_values = np.round(value_function_array, 2)
+        xs, ys = np.nonzero(rounded_values != self.shown_values)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            self.board[x][y].value_function_nb = value_function_array[x,y]
+            self.dirty_tiles.add((x, y))
+        self.shown_values = rounded_values
 
     def update_optimal_actions(self,optimal_actions):
-        for x,row in enumerate(self.board):
-                for y,tile in enumerate(row):
-                    tile.policy_arrow =  optimal_actions[x,y]
+        # Only the tiles whose arrow changes are updated (none when headless)
+        if self.surface is None:
+            return
+        xs, ys = np.nonzero(np.asarray(optimal_actions) != self.shown_arrows)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            self.board[x][y].policy_arrow = optimal_actions[x,y]
+            self.dirty_tiles.add((x, y))
+        self.shown_arrows = np.array(optimal_actions, dtype=object)
 
     def draw(self):
-        # Draw the tiles.
+        # Draw the tiles that changed since the last draw (all of them
+        # the first time) and remember their rects for refresh_display.
         # - self is the Grid_World game
+        if self.surface is None:
+            return []
+        import pygame
+
+        board = self.board
         pos = self.find_board_coords(self.position)
         goal = self.find_board_coords(self.goal_coord)
-        self.surface.fill(self.bgColor)
-        for row in self.board:
-            for tile in row:
-                tile.draw(pos, goal,tile.value_function_nb,tile.policy_arrow)
+
+        if self.full_redraw:
+            self.surface.fill(self.bgColor)
+            tiles = [tile for row in board for tile in row]
+            rects = [self.surface.get_rect()]
+            self.full_redraw = False
+        else:
+            # The agent and the goal dirty the tiles they leave and enter
+            if pos != self.shown_position:
+                self.dirty_tiles.update([tuple(self.shown_position), tuple(pos)])
+            if goal != self.shown_goal:
+                self.dirty_tiles.update([tuple(self.shown_goal), tuple(goal)])
+            tiles = [board[x][y] for x, y in self.dirty_tiles]
+            rects = [pygame.Rect(tile.origin, tile.tile_size) for tile in tiles]
+
+        for tile in tiles:
+            tile.draw(pos, goal,tile.value_function_nb,tile.policy_arrow)
+
+        self.dirty_tiles.clear()
+        self.shown_position = pos
+        self.shown_goal = goal
+        self.dirty_rects.extend(rects)
+        return rects
+
+    def refresh_display(self):
+        # Show the rects drawn since the last refresh in the window
+        # (no-op when headless or when nothing was redrawn)
+        if self.surface is None or not self.dirty_rects:
+            return
+        import pygame
+
+        pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
+
+    def handle_events(self):
+        # Pump the window events and quit on close (no-op when headless)
+        if self.surface is None:
+            return
+        import pygame
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+                # Handle additional events
 
     def update(self):
         # Check if the game is over. If so return True.
@@ -260,32 +414,36 @@ class Grid_World:
         # and return False.
         # - self is the TTT game
 
-        if self.position == self.goal_coord:
+        if self.game_over():
             return True
         else:
             self.draw()
             return False
 
+    def game_over(self):
+        # Return True if the agent reached the goal (a terminal cell).
+        return bool(self.terminal[self.position[0], self.position[1]])
+
     def step(self, action):
         x, y = self.position
         if action == 0:  # Action Up
             # print "Up"
-            if [x - 1, y] not in self.wall_coords and x - 1 > 0:
+            if x - 1 >= 0 and not self.walls[x - 1, y]:
                 self.position = [x - 1, y]
 
         elif action == 1:  # Action Down
             # print "Down"
-            if [x + 1, y] not in self.wall_coords and x + 1 < self.board_size[0]:
+            if x + 1 < self.board_size[0] and not self.walls[x + 1, y]:
                 self.position = [x + 1, y]
 
         elif action == 2:  # Action Right
             # print "Right"
-            if [x, y + 1] not in self.wall_coords and y + 1 < self.board_size[1]:
+            if y + 1 < self.board_size[1] and not self.walls[x, y + 1]:
                 self.position = [x, y + 1]
 
         elif action == 3:  # Action Left
             # print "Left"
-            if [x, y - 1] not in self.wall_coords and y - 1 > 0:
+            if y - 1 >= 0 and not self.walls[x, y - 1]:
                 self.position = [x, y - 1]
 
         # Reward definition
@@ -295,15 +453,49 @@ class Grid_World:
             self.reward_qlearning = 0
 
     def change_the_wall(self, wall_coords):
-        self.wall_coords = wall_coords
-        self.calc_wall_coords()
-        self.createTiles()
+        # Replace the walls (list of [x, y] coords or occupancy grid); the
+        # tiles are derived again on the next draw
+        self.walls = StateSpace.wall_grid(self.board_size, default_wall_coords(self.board_size, wall_coords)).astype(np.uint8)
+        self.tiles = None
+        self.resetDrawState()
 
     def change_the_goal(self, goal):
         self.goal_coord = list(goal)
+        # The goal is the terminal cell (none if it is off the board)
+        self.terminal[:] = False
+        if 0 <= self.goal_coord[0] < self.board_size[0] and 0 <= self.goal_coord[1] < self.board_size[1]:
+            self.terminal[self.goal_coord[0], self.goal_coord[1]] = True
+
+    def apply_delta(self, delta):
+        # Apply a BoardDelta in place. Unlike change_the_wall, only the
+        # tiles of the changed cells are updated (and redrawn).
+        # - delta is the BoardDelta to apply
+        for x, y in delta.remove_walls:
+            self.walls[x, y] = 0
+        for x, y in delta.add_walls:
+            self.walls[x, y] = 1
+
+        if self.tiles is not None:
+            for x, y in delta.remove_walls:
+                self.tiles[x][y].wall = False
+                self.dirty_tiles.add((x, y))
+            for x, y in delta.add_walls:
+                self.tiles[x][y].wall = True
+                self.dirty_tiles.add((x, y))
+
+        if delta.goal_coord is not None:
+            self.change_the_goal(delta.goal_coord)
+        self.reward_overrides.update(delta.rewards)
+
+        # Rewards are only kept up to date once they have been instantiated
+        if len(self.rewards_list):
+            self.instanciate_rewards_list()
 
 
 if __name__ == "__main__":
+    import pygame
+    from pygame.locals import *
+
     # Initialize pygame
     pygame.init()
 
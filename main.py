@@ -1,7 +1,15 @@
 from argparse import ArgumentParser
+import sys
 from signal import pause
 from q_learner import Q_learning
+from prioritized_sweeping import PrioritizedSweeping
 from policy_iteration import PolicyIteration
+from value_iteration import ValueIteration
+from render_policy import RenderPolicy
+from profiler import Profiler
+from background import BackgroundSolver, SnapshotBuffer, display_snapshots
+from gridworld import Grid_World
+from board_maps import load_map
 import pygame
 from pygame.locals import *
 
@@ -36,7 +44,36 @@ NUM_EPISODES = 200
 transition_timestep = 3000
 final_epsilon = 0.01
 anneal_epsilon_episodes = 10
-epsilon_anneal_rate = (1.0 - final_epsilon) / float(anneal_epsilon_episodes)
+epsilon_anneal_rate = None  # derived from the starting epsilon of each phase, so final_epsilon is reached after anneal_epsilon_episodes
+
+def keep_window_open():
+    # Keep the converged value function and policy on screen until the window is closed
+    while True:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                pygame.quit()
+                sys.exit()
+        pygame.time.wait(100)
+
+def run_solver(solve, args, ui_board, snapshots):
+    # Run the solver here, or in a background thread while this thread
+    # draws its snapshots on ui_board (--background)
+    if snapshots is None:
+        return solve()
+    solver = BackgroundSolver(solve).start()
+    display_snapshots(ui_board, snapshots, solver, max_fps=args.max_fps or 30)
+    return solver.result()
+
+def write_profile(profiler, args):
+    # Write the phase timers and counters of the finished run, if asked
+    if not profiler.enabled:
+        return
+    print(profiler.report())
+    if args.profile is not None:
+        profiler.write_summary(args.profile)
+    if args.profile_trace is not None:
+        profiler.write_trace(args.profile_trace)
+
 
 if __name__ == "__main__":
     parser = ArgumentParser()
@@ -47,12 +84,129 @@ if __name__ == "__main__":
         type=str,
         help="Choice of strategy.",
     )
+    parser.add_argument(
+        "--render-every",
+        default=1,
+        type=int,
+        help="Draw one sweep/step out of RENDER_EVERY.",
+    )
+    parser.add_argument(
+        "--max-fps",
+        default=None,
+        type=float,
+        help="Draw at most MAX_FPS frames per second.",
+    )
+    parser.add_argument(
+        "--final-only",
+        action="store_true",
+        help="Only draw the final frame of the run.",
+    )
+    parser.add_argument(
+        "--num-envs",
+        default=64,
+        type=int,
+        help="Number of environments run in lockstep by qlearning_batched.",
+    )
+    parser.add_argument(
+        "--lmbda",
+        default=0.0,
+        type=float,
+        help="Lambda of Watkins Q(lambda) for qlearning (0 for one-step Q-learning).",
+    )
+    parser.add_argument(
+        "--trace",
+        default="replacing",
+        choices=["replacing", "accumulating"],
+        help="Eligibility trace type of Q(lambda).",
+    )
+    parser.add_argument(
+        "--planning-steps",
+        default=0,
+        type=int,
+        help="Dyna-Q planning updates after each real step (0 to disable).",
+    )
+    parser.add_argument(
+        "--planning",
+        default="model",
+        choices=["model", "buffer"],
+        help="Source of the Dyna-Q planning transitions: learned tabular model or replay buffer.",
+    )
+    parser.add_argument(
+        "--stop-patience",
+        default=None,
+        type=int,
+        help="Stop Q-learning once the greedy policy is unchanged for STOP_PATIENCE consecutive checks (one check every stop_check_every episodes, every episode by default).",
+    )
+    parser.add_argument(
+        "--stop-td-error",
+        default=None,
+        type=float,
+        help="Stop Q-learning once the max TD error of an episode falls under STOP_TD_ERROR.",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Append the per-episode Q-learning metrics to this binary stream (see plotter.py).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint directory saved during the run (qlearning, qlearning_prioritized, policy_iter, value_iter only).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the run from the --checkpoint directory, if it exists.",
+    )
+    parser.add_argument(
+        "--map",
+        default=None,
+        help="ASCII-art (.txt, .map) or image map file giving the board size, walls, start and goal (policy_iter, value_iter; at most 600 cells per side).",
+    )
+    parser.add_argument(
+        "--background",
+        action="store_true",
+        help="Run the solver headless in a background thread; the window draws its latest state at up to MAX_FPS (30) frames per second.",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Write the phase timers and counters of the run to this JSON file.",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        default=None,
+        help="Also write the timeline of every timed phase to this trace-event JSON file (chrome://tracing).",
+    )
+
+    args = parser.parse_args()
+
+    # The headless batched/fast runners do not checkpoint
+    if args.type_of_strategy in ("qlearning_batched", "qlearning_fast") and (args.checkpoint is not None or args.resume):
+        parser.error("--checkpoint and --resume are not supported by the qlearning_batched and qlearning_fast strategies")
+
+    # The batched/fast runners are always headless: nothing to draw in the background
+    if args.type_of_strategy in ("qlearning_batched", "qlearning_fast") and args.background:
+        parser.error("--background is not supported by the qlearning_batched and qlearning_fast strategies")
+
+    # Board read from a map file (the wall does not change during the run)
+    if args.map is not None:
+        if args.type_of_strategy not in ("policy_iter", "value_iter"):
+            parser.error("--map is only supported by the policy_iter and value_iter strategies")
+        map_walls, START_COORD, GOAL_COORD = load_map(args.map)
+        BOARD_SIZE = list(map_walls.shape)
+        ORIGINAL_WALL = NEW_WALL = map_walls
 
     # Init pygame
     pygame.init()
 
-    # Set window size and title, and frame delay
-    surfaceSize = (600, 600)
+    # Set window size and title, and frame delay: 60-pixel tiles, smaller
+    # ones (colors only) for the boards larger than the 600x600 window
+    max_surface_side = 600
+    tile_side = min(Grid_World.tile_width, max_surface_side // max(BOARD_SIZE))
+    if tile_side < 1:
+        parser.error(f"a {BOARD_SIZE[0]}x{BOARD_SIZE[1]} board does not fit in the window (at most {max_surface_side} cells per side)")
+    surfaceSize = (BOARD_SIZE[1] * tile_side, BOARD_SIZE[0] * tile_side)
     windowTitle = "Grid_World"
 
     # Create the window
@@ -62,18 +216,22 @@ if __name__ == "__main__":
     #Nb of tiles
     n = BOARD_SIZE[0] * BOARD_SIZE[1]
 
-    args = parser.parse_args()
+    render_policy = RenderPolicy(every=args.render_every, max_fps=args.max_fps, final_only=args.final_only)
+    profiler = Profiler(enabled=args.profile is not None or args.profile_trace is not None, trace=args.profile_trace is not None)
+    snapshots = SnapshotBuffer() if args.background else None
+    solver_surface = None if args.background else surface
 
-    if args.type_of_strategy == "qlearning":
-        agent = Q_learning(
+    if args.type_of_strategy in ("qlearning", "qlearning_batched", "qlearning_fast", "qlearning_prioritized"):
+        agent_class = PrioritizedSweeping if args.type_of_strategy == "qlearning_prioritized" else Q_learning
+        agent = agent_class(
             alpha=0.5,
             gamma=0.95,
-            lmbda=0.0,
+            lmbda=args.lmbda,
             epsilon=0.1,
             n=n,
             num_actions= len(ACTION_DICT),
             num_episodes=NUM_EPISODES,
-            surface = surface,
+            surface = solver_surface,
             board_size=BOARD_SIZE,
             start_coord=START_COORD,
             original_wall = ORIGINAL_WALL,
@@ -83,17 +241,43 @@ if __name__ == "__main__":
             transition_timestep=transition_timestep,
             final_epsilon=final_epsilon,
             anneal_epsilon_episodes=anneal_epsilon_episodes,
-            epsilon_anneal_rate=epsilon_anneal_rate
+            epsilon_anneal_rate=epsilon_anneal_rate,
+            render_policy=render_policy,
+            trace=args.trace,
+            planning_steps=args.planning_steps,
+            planning=args.planning,
+            stop_patience=args.stop_patience,
+            stop_td_error=args.stop_td_error,
+            metrics_path=args.metrics,
+            checkpoint_path=args.checkpoint,
+            profiler=profiler,
+            snapshots=snapshots
         )
-        agent.q_learning()
+        if args.type_of_strategy == "qlearning_batched":
+            agent.batched_q_learning(num_envs=args.num_envs)
+        elif args.type_of_strategy == "qlearning_fast":
+            agent.fast_q_learning()
+        else:
+            ui_board = Grid_World(surface, BOARD_SIZE, ORIGINAL_WALL, START_COORD) if args.background else None
+            run_solver(lambda: agent.q_learning(resume=args.resume), args, ui_board, snapshots)
+        write_profile(profiler, args)
     
+    # Board the UI thread draws the DP snapshots on (--background)
+    if args.background and args.type_of_strategy in ("policy_iter", "value_iter"):
+        dp_board = Grid_World(surface, BOARD_SIZE, ORIGINAL_WALL, START_COORD, GOAL_COORD, REWARD_GOAL, REWARD_WALL, REWARD_EMPTY)
+        dp_board.instanciate_rewards_list()
+    else:
+        dp_board = None
+
     if args.type_of_strategy == "policy_iter":
-        agent = PolicyIteration( surface = surface,transition_timestep = transition_timestep,board_size = BOARD_SIZE,original_wall = ORIGINAL_WALL,new_wall=NEW_WALL,pauseTime=PAUSE_TIME,start_coord=START_COORD,goal_coord = GOAL_COORD,reward_goal = REWARD_GOAL,reward_wall=REWARD_WALL,reward_empty=REWARD_EMPTY, v0_val=V0_VAL, gamma=GAMMA, theta=THETA, seed=SEED)
-        agent.policy_iteration()
-        
+        agent = PolicyIteration( surface = solver_surface,transition_timestep = transition_timestep,board_size = BOARD_SIZE,original_wall = ORIGINAL_WALL,new_wall=NEW_WALL,pauseTime=PAUSE_TIME,start_coord=START_COORD,goal_coord = GOAL_COORD,reward_goal = REWARD_GOAL,reward_wall=REWARD_WALL,reward_empty=REWARD_EMPTY, v0_val=V0_VAL, gamma=GAMMA, theta=THETA, seed=SEED, render_policy=render_policy, checkpoint_path=args.checkpoint, profiler=profiler, snapshots=snapshots)
+        run_solver(lambda: agent.policy_iteration(resume=args.resume), args, dp_board, snapshots)
+        write_profile(profiler, args)
+        keep_window_open()
 
     if args.type_of_strategy == "value_iter":
-        #agent = Value_Iteration()
-        #agent.play()
-        pass
+        agent = ValueIteration( surface = solver_surface,transition_timestep = transition_timestep,board_size = BOARD_SIZE,original_wall = ORIGINAL_WALL,new_wall=NEW_WALL,pauseTime=PAUSE_TIME,start_coord=START_COORD,goal_coord = GOAL_COORD,reward_goal = REWARD_GOAL,reward_wall=REWARD_WALL,reward_empty=REWARD_EMPTY, v0_val=V0_VAL, gamma=GAMMA, theta=THETA, seed=SEED, render_policy=render_policy, checkpoint_path=args.checkpoint, profiler=profiler, snapshots=snapshots)
+        run_solver(lambda: agent.value_iteration(resume=args.resume), args, dp_board, snapshots)
+        write_profile(profiler, args)
+        keep_window_open()
 
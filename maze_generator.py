@@ -0,0 +1,231 @@
+"""
+Seeded procedural layouts of Gridworld boards, for scaling and stress tests.
+
+Every generator returns the same triple as board_maps.load_map: the uint8 wall
+occupancy layer, the start and the goal, so the layouts can be given to
+Grid_World, BatchGridWorld and the solvers as original_wall / new_wall. They
+are built with whole-array operations only (no per-cell Python loop), so even
+4096 x 4096 boards take a fraction of a second. Layouts:
+    - maze: perfect maze (exactly one path between two cells), sidewinder algorithm
+      on the even cells, whose odd neighbors are the passages;
+    - rooms: rectangular rooms of random sizes, one door towards each neighbor room;
+    - random: independent walls with the given density, plus a random monotone
+      path that keeps the goal reachable from the start;
+    - corridors: one long serpentine corridor of the given width.
+The start is the top-left cell; the goal is the bottom-right cell (for the
+perfect maze, the bottom-right maze cell; for corridors, the end of the corridor).
+
+Usage:
+    python3 maze_generator.py maze 101 101 --seed 0 --output maze.txt
+"""
+from argparse import ArgumentParser
+
+import numpy as np
+
+
+def perfect_maze(board_size, rng):
+    """
+    Perfect maze (a spanning tree of the even cells), drawn with the sidewinder algorithm:
+    on every row but the first, the cells are split in random runs joined to the east,
+    and each run opens one passage to the north, at a random cell of the run.
+
+    Args:
+        board_size (tuple): (height, width) of the grid
+        rng (Generator): NumPy random generator
+
+    Returns:
+        walls (array): uint8 occupancy layer
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    height, width = board_size
+    rows, cols = (height + 1) // 2, (width + 1) // 2  # maze cells, at the even coords
+
+    walls = np.ones((height, width), dtype=np.uint8)
+    walls[0:2 * rows:2, 0:2 * cols:2] = 0
+    # The first row is one run
+    walls[0, 1:2 * cols - 1:2] = 0
+    if rows > 1:
+        # close[i, j]: the run of row i + 1 ends at column j (always at the last column)
+        close = rng.random((rows - 1, cols)) < 0.5
+        close[:, -1] = True
+        east = walls[2:2 * rows:2, 1:2 * cols - 1:2]
+        east[~close[:, :-1]] = 0
+
+        # One north passage per run, at a random cell of the run
+        ends = np.flatnonzero(close)
+        starts = np.r_[0, ends[:-1] + 1]
+        chosen = starts + (rng.random(len(ends)) * (ends - starts + 1)).astype(np.int64)
+        walls[2 * (chosen // cols + 1) - 1, 2 * (chosen % cols)] = 0
+
+    return walls, [0, 0], [2 * (rows - 1), 2 * (cols - 1)]
+
+
+def cut_lines(length, rng, room_size):
+    """
+    Random positions of the wall lines splitting [0, length) in rooms of room_size[0] to
+    room_size[1] cells (the last room may be larger).
+    """
+    low, high = room_size
+    lines = np.cumsum(rng.integers(low, high + 1, size=length // low + 1) + 1) - 1
+    return lines[lines < length - low]
+
+
+def doors(lines, other_lines, length, rng):
+    """
+    Random door position, along each wall line, in each segment between the crossing lines.
+
+    Returns:
+        along (array), across (array): coords of the doors (along the lines, then the line positions)
+    """
+    edges = np.r_[-1, other_lines, length]
+    low, size = edges[:-1] + 1, np.diff(edges) - 1
+    along = low + (rng.random((len(lines), len(low))) * size).astype(np.int64)
+    return along.ravel(), np.repeat(lines, len(low))
+
+
+def rooms_and_doors(board_size, rng, room_size=(4, 12)):
+    """
+    Grid of rectangular rooms of random sizes, with one door towards each neighbor room.
+
+    Args:
+        board_size (tuple): (height, width) of the grid
+        rng (Generator): NumPy random generator
+        room_size (tuple): minimum and maximum side of a room, in cells
+
+    Returns:
+        walls (array): uint8 occupancy layer
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    height, width = board_size
+    wall_rows = cut_lines(height, rng, room_size)
+    wall_cols = cut_lines(width, rng, room_size)
+
+    walls = np.zeros((height, width), dtype=np.uint8)
+    walls[wall_rows, :] = 1
+    walls[:, wall_cols] = 1
+
+    door_cols, door_rows = doors(wall_rows, wall_cols, width, rng)
+    walls[door_rows, door_cols] = 0
+    door_rows, door_cols = doors(wall_cols, wall_rows, height, rng)
+    walls[door_rows, door_cols] = 0
+
+    return walls, [0, 0], [height - 1, width - 1]
+
+
+def random_obstacles(board_size, rng, density=0.3):
+    """
+    Independent walls with the given density. A random monotone path (moves down and right)
+    from the start to the goal is kept free, so the goal is always reachable.
+
+    Args:
+        board_size (tuple): (height, width) of the grid
+        rng (Generator): NumPy random generator
+        density (float): probability of a cell being a wall
+
+    Returns:
+        walls (array): uint8 occupancy layer
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    height, width = board_size
+    walls = (rng.random((height, width)) < density).astype(np.uint8)
+
+    moves = rng.permutation(np.r_[np.zeros(height - 1, dtype=np.int64), np.ones(width - 1, dtype=np.int64)])
+    path_x = np.r_[0, np.cumsum(moves == 0)]
+    path_y = np.r_[0, np.cumsum(moves == 1)]
+    walls[path_x, path_y] = 0
+
+    return walls, [0, 0], [height - 1, width - 1]
+
+
+def corridors(board_size, rng, width=1):
+    """
+    One serpentine corridor of the given width: wall rows every width + 1 rows, each open
+    at one end, alternately right and left. The goal is the end of the corridor.
+
+    Args:
+        board_size (tuple): (height, width) of the grid
+        rng (Generator): NumPy random generator (unused, the layout is deterministic)
+        width (int): width of the corridor, in cells
+
+    Returns:
+        walls (array): uint8 occupancy layer
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    height, board_width = board_size
+    wall_rows = np.arange(width, height - 1, width + 1)
+
+    walls = np.zeros((height, board_width), dtype=np.uint8)
+    walls[wall_rows, :] = 1
+    # Alternate openings: right end, left end, ...
+    openings = np.where(np.arange(len(wall_rows)) % 2 == 0, board_width - 1, 0)
+    walls[wall_rows, openings] = 0
+
+    goal_y = board_width - 1 if len(wall_rows) % 2 == 0 else 0
+    return walls, [0, 0], [height - 1, goal_y]
+
+
+LAYOUTS = {
+    "maze": perfect_maze,
+    "rooms": rooms_and_doors,
+    "random": random_obstacles,
+    "corridors": corridors,
+}
+
+
+def generate(layout, board_size, seed=None, **options):
+    """
+    Generates one seeded layout.
+
+    Args:
+        layout (str): name of the layout (see LAYOUTS)
+        board_size (tuple): (height, width) of the grid
+        seed (int): seed of the layout (same seed, same board)
+        options: keyword arguments of the layout (room_size, density, width)
+
+    Returns:
+        walls (array): uint8 occupancy layer
+        start_coord (list): Coordinates [X,Y] of the start
+        goal_coord (list): Coordinates [X,Y] of the goal
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown layout {layout!r}, expected one of {sorted(LAYOUTS)}")
+    return LAYOUTS[layout](tuple(board_size), np.random.default_rng(seed), **options)
+
+
+def generate_boards(layout, board_size, seeds, **options):
+    """
+    Yields (seed, walls, start_coord, goal_coord) for every seed, e.g. for regression runs.
+    """
+    for seed in seeds:
+        yield (seed, *generate(layout, board_size, seed, **options))
+
+
+if __name__ == "__main__":
+    from board_maps import save_map
+
+    parser = ArgumentParser()
+    parser.add_argument(dest="layout", choices=list(LAYOUTS), help="Layout to generate.")
+    parser.add_argument(dest="height", type=int, help="Number of rows.")
+    parser.add_argument(dest="width", type=int, help="Number of columns.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the layout.")
+    parser.add_argument("--density", type=float, default=None, help="Wall density (random layout).")
+    parser.add_argument("--room-size", nargs=2, type=int, default=None, metavar=("MIN", "MAX"), help="Room sides (rooms layout).")
+    parser.add_argument("--corridor-width", type=int, default=None, help="Corridor width (corridors layout).")
+    parser.add_argument("--output", default="board.txt", help="Map file (.txt/.map ASCII art, or an image such as .png).")
+    args = parser.parse_args()
+
+    options = {}
+    if args.density is not None:
+        options["density"] = args.density
+    if args.room_size is not None:
+        options["room_size"] = tuple(args.room_size)
+    if args.corridor_width is not None:
+        options["width"] = args.corridor_width
+
+    walls, start_coord, goal_coord = generate(args.layout, (args.height, args.width), args.seed, **options)
+    save_map(args.output, walls, start_coord, goal_coord)
+    print(f"{args.layout} board of {args.height}x{args.width} ({walls.mean():.0%} walls) written to {args.output}")
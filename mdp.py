@@ -0,0 +1,114 @@
+"""
+Tabular MDP compilation of a Gridworld board, shared by the DP solvers.
+
+We are assuming the Dynamic Programming model of the board:
+    - states are indexed by a StateSpace; by default every cell is a state (walls
+      included, they are only penalized), so s = x * width + y;
+    - when the action sends us to a cell outside the grid (or to a cell excluded
+      from the state space), we stay in the same cell;
+    - the reward of a transition is the reward of the cell we move to (board.rewards_list);
+    - the goal is a terminal state.
+"""
+import numpy as np
+from batch_gridworld import ACTION_DELTAS
+from state_space import StateSpace
+
+
+class TabularMDP():
+    def __init__(self, state_space, next_state, rewards, terminal):
+        """
+        Holds the S x A transition and reward tables of a board.
+
+        Args:
+            state_space (StateSpace): indexing of the states
+            next_state (array): int array of shape (S, A), next_state[s, a] is the index of the next state
+            rewards (array): float array of shape (S, A), rewards[s, a] is the reward of taking a in s
+            terminal (array): boolean array of shape (S,), True for terminal states
+        """
+        self.state_space = state_space
+        self.board_size = state_space.board_size
+        self.next_state = next_state
+        self.rewards = rewards
+        self.terminal = terminal
+        self.num_states, self.num_actions = next_state.shape
+        self.predecessor_offsets = None
+        self.predecessor_states = None
+
+    def state_index(self, x, y):
+        """
+        Returns the index of the state (x,y).
+        """
+        return self.state_space.index[x, y]
+
+    def predecessors(self, states):
+        """
+        Returns the states that can move to one of the given states in one step.
+
+        Args:
+            states (array): int array of state indices
+
+        Returns:
+            predecessors (array): sorted int array of unique state indices
+        """
+        if self.predecessor_offsets is None:
+            # CSR layout of the inverted next_state table, built on first use
+            order = np.argsort(self.next_state.reshape(-1), kind="stable")
+            self.predecessor_states = order // self.num_actions
+            self.predecessor_offsets = np.zeros(self.num_states + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.next_state.reshape(-1), minlength=self.num_states), out=self.predecessor_offsets[1:])
+
+        starts = self.predecessor_offsets[states]
+        counts = self.predecessor_offsets[states + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return np.unique(self.predecessor_states[positions])
+
+    def action_values(self, v, gamma):
+        """
+        Computes the ACTION-value function Q(s,a) = r(s,a) + gamma * v(s') of every state at once.
+
+        Args:
+            v (array): value function, of shape (S,) or (height, width) when every cell is a state
+            gamma (float): gamma parameter (between 0 and 1)
+
+        Returns:
+            q (array): (S, A) array of action values
+        """
+        return self.rewards + gamma * v.reshape(-1)[self.next_state]
+
+
+def compile_mdp(board, state_space=None):
+    """
+    Builds the transition and reward tables of a board once.
+
+    Args:
+        board (Grid_World): gridworld environment
+        state_space (StateSpace): indexing of the states (every cell of the board if None)
+
+    Returns:
+        mdp (TabularMDP): compiled tables
+    """
+    if len(board.rewards_list) == 0:
+        board.instanciate_rewards_list()
+    if state_space is None:
+        state_space = StateSpace(board.board_size)
+
+    board_height, board_width = board.board_size
+    xs = state_space.coords[:, :1]
+    ys = state_space.coords[:, 1:]
+
+    # Same rule as PolicyIteration.get_next_state: forbid to go out of board
+    next_x = np.clip(xs + ACTION_DELTAS[:, 0], 0, board_height - 1)
+    next_y = np.clip(ys + ACTION_DELTAS[:, 1], 0, board_width - 1)
+    next_state = state_space.index[next_x, next_y]
+
+    # Rewards are read on the cell we move to, even when it is not a state
+    rewards = np.asarray(board.rewards_list, dtype=np.float64)[next_x, next_y]
+
+    # Cells outside the state space can not be entered
+    blocked = next_state < 0
+    next_state[blocked] = np.broadcast_to(np.arange(state_space.num_states)[:, None], next_state.shape)[blocked]
+
+    # Terminal mask of the board (the goal), read on the states
+    terminal = board.terminal[xs[:, 0], ys[:, 0]]
+
+    return TabularMDP(state_space, next_state, rewards, terminal)
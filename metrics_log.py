@@ -0,0 +1,179 @@
+"""
+Append-only binary metrics stream of the Q-learning episodes.
+
+We are assuming one fixed-size record per episode (METRICS_DTYPE):
+    - episode (int64): episode number, from 0;
+    - return (float64), length (int64): episode return and number of timesteps;
+    - epsilon (float64): exploration rate of the episode;
+    - wall_time (float64): Unix time at the end of the episode.
+The file is a 16-byte header (magic, version, record size) followed by the raw
+records. The writer buffers records in a preallocated array and appends them in
+batches, so a crash loses at most the last unflushed batch. The reader memory-maps
+the complete records, so a running stream can be tailed without reparsing it.
+"""
+import os
+import time
+
+import numpy as np
+
+METRICS_DTYPE = np.dtype([
+    ("episode", "<i8"),
+    ("return", "<f8"),
+    ("length", "<i8"),
+    ("epsilon", "<f8"),
+    ("wall_time", "<f8"),
+])
+MAGIC = b"GWMETRIC"
+VERSION = 1
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+
+
+def is_metrics_file(path):
+    """
+    Checks whether path starts with the metrics stream header.
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MetricsWriter():
+    def __init__(self, path, flush_every=1024, flush_seconds=1.0):
+        """
+        Opens (or creates) a metrics stream in append mode.
+
+        Args:
+            path (str): stream file
+            flush_every (int): number of buffered records that triggers a write
+            flush_seconds (float): records older than this are written with the next record
+        """
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.buffer = np.zeros(flush_every, dtype=METRICS_DTYPE)
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            header = np.array([(MAGIC, VERSION, METRICS_DTYPE.itemsize)], dtype=HEADER)
+            self.file.write(header.tobytes())
+            self.file.flush()
+        elif not is_metrics_file(path):
+            self.file.close()
+            raise ValueError(f"{path} is not a metrics stream")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def log(self, episode, episode_return, length, epsilon):
+        """
+        Buffers the record of one finished episode.
+        """
+        self.buffer[self.size] = (episode, episode_return, length, epsilon, time.time())
+        self.size += 1
+        if self.size == len(self.buffer) or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def log_batch(self, first_episode, returns, lengths, epsilons):
+        """
+        Buffers the records of several episodes finished together (arrays of shape (N,),
+        epsilons may be a scalar), numbered from first_episode.
+        """
+        count = len(returns)
+        records = np.zeros(count, dtype=METRICS_DTYPE)
+        records["episode"] = first_episode + np.arange(count)
+        records["return"] = returns
+        records["length"] = lengths
+        records["epsilon"] = epsilons
+        records["wall_time"] = time.time()
+
+        if self.size + count > len(self.buffer):
+            self.flush()
+        if count > len(self.buffer):
+            self.file.write(records.tobytes())
+            self.file.flush()
+            return
+        self.buffer[self.size:self.size + count] = records
+        self.size += count
+        if self.size == len(self.buffer) or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered records to the file.
+        """
+        if self.size:
+            self.file.write(self.buffer[:self.size].tobytes())
+            self.file.flush()
+            self.size = 0
+        self.last_flush = time.monotonic()
+
+    def truncate(self, first_episode):
+        """
+        Drops the trailing records of the episodes numbered first_episode or more, e.g. the
+        ones logged after the checkpoint a resumed run restarts from (and any incomplete record).
+
+        Returns:
+            dropped (int): number of records dropped
+        """
+        self.flush()
+        episodes = np.array(MetricsReader(self.path).read()["episode"])
+        earlier = np.flatnonzero(episodes < first_episode)
+        kept = int(earlier[-1]) + 1 if len(earlier) else 0
+        os.truncate(self.path, HEADER.itemsize + kept * METRICS_DTYPE.itemsize)
+        return len(episodes) - kept
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class MetricsReader():
+    def __init__(self, path):
+        """
+        Reader of a metrics stream, possibly still being written.
+
+        Args:
+            path (str): stream file
+        """
+        self.path = path
+        self.position = 0  # records already returned by new_records
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{path} is not a metrics stream")
+        if header["record_size"][0] != METRICS_DTYPE.itemsize:
+            raise ValueError(f"{path} has records of {header['record_size'][0]} bytes, expected {METRICS_DTYPE.itemsize}")
+
+    def __len__(self):
+        return max(0, (os.path.getsize(self.path) - HEADER.itemsize) // METRICS_DTYPE.itemsize)
+
+    def read(self):
+        """
+        Memory-maps all the complete records written so far.
+
+        Returns:
+            records (array): read-only structured array of METRICS_DTYPE
+        """
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, dtype=METRICS_DTYPE)
+        return np.memmap(self.path, dtype=METRICS_DTYPE, mode="r", offset=HEADER.itemsize, shape=(count,))
+
+    def new_records(self):
+        """
+        Returns the records written since the previous call (all of them the first time).
+        """
+        records = self.read()[self.position:]
+        self.position += len(records)
+        return records
+
+
+def read_metrics(path):
+    """
+    Memory-maps all the complete records of a metrics stream.
+    """
+    return MetricsReader(path).read()
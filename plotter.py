@@ -1,11 +1,41 @@
+from argparse import ArgumentParser
+
 import numpy as np
 import matplotlib.pyplot as plt
 
-file_path = "/Users/nicolas/Desktop/Etudes/4_centrale_sup/CentraleSupelec/cours/centralesup_S_1/lab_project/models/GridWorld/Graph data/Part 1 - Complete Task/Run 2"
-timesteps = np.loadtxt(file_path + "/Episode_time")
+from metrics_log import MetricsReader, is_metrics_file
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(dest="path", help="Metrics stream (main.py --metrics), or a text Episode_time file.")
+    parser.add_argument("--field", default="length", choices=["length", "return", "epsilon"], help="Metric to plot.")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing the stream of a running job.")
+    parser.add_argument("--interval", default=2.0, type=float, help="Seconds between two refreshes with --follow.")
+    args = parser.parse_args()
 
-plt.plot(timesteps)
-plt.xlabel("Number of episodes")
-plt.ylabel("Timesteps required")
+    labels = {"length": "Timesteps required", "return": "Episode return", "epsilon": "Epsilon"}
+    plt.xlabel("Number of episodes")
+    plt.ylabel(labels[args.field])
 
-plt.show()
+    if not is_metrics_file(args.path):
+        # Text file written by np.savetxt (timesteps per episode)
+        plt.plot(np.loadtxt(args.path))
+        plt.show()
+    else:
+        reader = MetricsReader(args.path)
+        records = reader.new_records()
+        line, = plt.plot(records["episode"], records[args.field])
+        if not args.follow:
+            plt.show()
+        else:
+            # Only the records appended since the last refresh are read
+            episodes, values = [np.asarray(records["episode"])], [np.asarray(records[args.field])]
+            while plt.fignum_exists(line.figure.number):
+                records = reader.new_records()
+                if len(records):
+                    episodes.append(np.asarray(records["episode"]))
+                    values.append(np.asarray(records[args.field]))
+                    line.set_data(np.concatenate(episodes), np.concatenate(values))
+                    line.axes.relim()
+                    line.axes.autoscale_view()
+                plt.pause(args.interval)
@@ -6,12 +6,15 @@ We are assuming that:
     - when the action send us to a cell outside the grid, we will stay in the same cell.
 """
 import numpy as np
+import checkpoint
 from gridworld import Grid_World
-import pygame, sys, time
-from pygame.locals import *
+from mdp import compile_mdp
+from render_policy import RenderPolicy
+from profiler import Profiler
+import time
 
 class PolicyIteration():
-    def __init__(self, surface,transition_timestep,board_size,start_coord,goal_coord,original_wall,new_wall,reward_goal,reward_wall,reward_empty,pauseTime, v0_val, gamma, theta, seed):
+    def __init__(self, surface,transition_timestep,board_size,start_coord,goal_coord,original_wall,new_wall,reward_goal,reward_wall,reward_empty,pauseTime, v0_val, gamma, theta, seed, vectorized=True, render_policy=None, checkpoint_path=None, checkpoint_every=1, profiler=None, snapshots=None):
         """
         Initialize our PolicyIteration class.
 
@@ -26,6 +29,12 @@ class PolicyIteration():
             gamma (float): gamma parameter (between 0 and 1)
             theta (float): threshold parameter that defines when the change in the value function is negligible (i.e. when we can stop process)
             seed (int): seed (for matter of reproducible results)
+            vectorized (bool): run each Policy Evaluation sweep as one whole-array update instead of the per-state loop
+            render_policy (RenderPolicy): which sweeps are drawn (every sweep if None)
+            checkpoint_path (str): checkpoint directory written during the run (none if None)
+            checkpoint_every (int): number of iterations between two checkpoints
+            profiler (Profiler): phase timers and counters of the run (disabled if None)
+            snapshots (SnapshotBuffer): publish the frames there for a UI thread instead of drawing them (run headless)
         """
         self.surface = surface
         self.transition_timestep = transition_timestep
@@ -42,18 +51,26 @@ class PolicyIteration():
         self.gamma = gamma
         self.theta = theta
         self.seed = seed
+        self.vectorized = vectorized
+        self.render_policy = render_policy if render_policy is not None else RenderPolicy()
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.snapshots = snapshots
 
         self.v = []
         self.pi = []
         self.optimal_actions = []
+        self.mdp = None
 
-    def policy_iteration(self):
+    def policy_iteration(self, resume=False):
         """
         Runs the Policy Iteration algorithm:
             - Policy Evaluation
             - Policy Improvement
 
         Args:
+            resume (bool): start from the checkpoint at checkpoint_path, if there is one
             board (Environment): gridworld environment
             v0_val (int): initial value for the value function
             gamma (float): gamma parameter (between 0 and 1)
@@ -74,68 +91,60 @@ class PolicyIteration():
         else:
             board = Grid_World(self.surface, self.board_size, self.original_wall,self.start_coord,self.goal_coord,self.reward_goal,self.reward_wall,self.reward_empty)
 
-        # Draw objects
-        board.draw()
-
         #Instantiate rewards list
         board.instanciate_rewards_list()
 
+        # Compile transition and reward tables once for all sweeps
+        with self.profiler.phase("compile_mdp"):
+            self.mdp = compile_mdp(board)
+
         # Import board metrics
         board_height = board.board_size[0]
         board_width = board.board_size[1]
         
-        # Generate initial value function and policy
-        self.v = self.get_init_v(board_height,board_width, self.v0_val, board.goal_coord)
-        self.pi,self.optimal_actions = self.get_equiprobable_policy(board_height,board_width,board.actions)
+        # Generate initial value function and policy, or resume from the last checkpoint
+        if resume and self.checkpoint_path is not None and checkpoint.checkpoint_exists(self.checkpoint_path):
+            counters = self.load_checkpoint(self.checkpoint_path)
+            timesteps, flag = counters["timesteps"], counters["flag"]
+            print(f"\nResuming Policy Iteration from iteration {timesteps + 1}")
+        else:
+            self.v = self.get_init_v(board_height,board_width, self.v0_val, board.goal_coord)
+            self.pi,self.optimal_actions = self.get_equiprobable_policy(board_height,board_width,board.actions)
 
         # Send initial value function and policy to grid
-        board.update_value_function(self.v)
-        board.update_optimal_actions(self.optimal_actions)
-        
-
-        # Refresh the display
-        board.update()
-        pygame.display.update()
+        self.render(board)
 
         #Initialize policy as a NOT STABLE one
         policy_stable = False
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-                sys.exit()
-                # Handle additional events
-        
-            while(True):
-                if not policy_stable:
-                    timesteps += 1
-                    print(f"\nIteration {timesteps} of Policy Iteration algorithm")
 
-                    ############ Policy Evaluation Step ############
-                    self.policy_evaluation(board, self.v, self.pi, self.gamma, self.theta)
+        while not policy_stable:
+            # Handle events
+            with self.profiler.phase("events"):
+                board.handle_events()
 
-                    # Set the frame speed by pausing between frames
+            timesteps += 1
+            print(f"\nIteration {timesteps} of Policy Iteration algorithm")
 
-                    ############ Policy Improvement Step ############
-                    policy_stable = self.policy_improvement(board, self.v, self.pi, self.gamma)
+            ############ Policy Evaluation Step ############
+            self.policy_evaluation(board, self.v, self.pi, self.gamma, self.theta)
 
-                    # Set the frame speed by pausing between frames
+            ############ Policy Improvement Step ############
+            policy_stable = self.policy_improvement(board, self.v, self.pi, self.gamma)
 
-                    if timesteps >= self.transition_timestep and not flag:
-                        flag = 1
-                        break
+            if self.checkpoint_path is not None and timesteps % self.checkpoint_every == 0:
+                with self.profiler.phase("checkpoint"):
+                    self.save_checkpoint(self.checkpoint_path, {"timesteps": timesteps, "flag": flag})
 
-                    board.update()
+            if timesteps >= self.transition_timestep and not flag:
+                flag = 1
+                break
 
-                    # Refresh the display
-                    pygame.display.update()
+        # Always show the final value function and policy
+        self.render(board, final=True)
 
-                    print(f"\The whole Policy Iteration (eval -> improvement -> eval -> ...) algorithm converged after {timesteps} steps")
+        print(f"\nThe whole Policy Iteration (eval -> improvement -> eval -> ...) algorithm converged after {timesteps} steps")
 
-                else:
-                    time.sleep(5)
-                    
-                    
+        return self.v, self.pi
 
     def policy_evaluation(self,board, v, pi, gamma, theta):
         """
@@ -153,24 +162,27 @@ class PolicyIteration():
         iter = 0
 
         while delta >= theta:
-            old_v = v.copy()
-            delta = 0
-
-            
-            # Traverse all states
-            for x in range(board.board_size[0]): #[0,...,9]
-                for y in range(board.board_size[1]): #[0,...,9]
-                    # Run one iteration of the Bellman update rule for the value function
-                    self.bellman_update(board, v, old_v, x, y, pi, gamma)
-                    # Compute difference for EACH STATE, and take the maximum difference
-                    delta = max(delta, abs(old_v[x, y] - v[x, y]))
+            with self.profiler.phase("bellman_sweep"):
+                if self.vectorized:
+                    # Update every state at once
+                    delta = self.bellman_sweep(v, pi, gamma)
+                else:
+                    old_v = v.copy()
+                    delta = 0
+
+                    # Traverse all states
+                    for x in range(board.board_size[0]): #[0,...,9]
+                        for y in range(board.board_size[1]): #[0,...,9]
+                            # Run one iteration of the Bellman update rule for the value function
+                            self.bellman_update(board, v, old_v, x, y, pi, gamma)
+                            # Compute difference for EACH STATE, and take the maximum difference
+                            delta = max(delta, abs(old_v[x, y] - v[x, y]))
+            self.profiler.count("sweeps")
+            self.profiler.count("backups", v.size)
 
             # Send new value function to grid
-            board.update_value_function(v)
-            time.sleep(self.pauseTime)
-            board.draw()
-            pygame.display.update()
-            
+            self.render(board, v)
+
             iter += 1
 
         print(f"\nValue function updated: the Policy Evaluation algorithm converged after {iter} sweeps")
@@ -186,68 +198,161 @@ class PolicyIteration():
             pi (array): numpy array representing the policy
             gamma (float): gamma parameter (between 0 and 1)
         """
-        policy_stable = True
-
-        # Iterate states
-        for x in range(board.board_size[0]-1):
-            for y in range(board.board_size[1]-1):
-                old_pi = pi[x, y, :].copy()
-
-                # Instanciate best actions list & best action val
-                best_actions = []
-                max_action_val = None
-
-                ############ COMPUTE the ACTION-value function Q_𝜋(s,a) for each action ############
-                for a in board.actions:
-                    # Get next state
-                    board_height = board.board_size[0]
-                    board_length = board.board_size[1]
-                    s_prime_x, s_prime_y = self.get_next_state(x,y,a,board_height,board_length)  
-
-                    # Get ACTION value 
-                    curr_action_value = board.rewards_list[s_prime_x, s_prime_y] + gamma * v[s_prime_x, s_prime_y]
-
-                    if max_action_val is None: #If no best action, add this one
-                        max_action_val = curr_action_value
-                        best_actions.append(a)
-                    elif curr_action_value > max_action_val: #If better than precedent action, replace
-                        max_action_val = curr_action_value
-                        best_actions = [a]
-                    elif curr_action_value == max_action_val: # If the Action-value for this specific actions equals another Action-value of another action, both deserve to be taken
-                        best_actions.append(a)
-
-                # Define new policy π(a|s) with the following variables
-                # - pi: current policy, will be updated by new_policy
-                # - current_state: state for which the policy should be updated
-                # - new_policy: best actions to take for this specific state
-                # - actions: all set of actions 
-                self.pi[x,y] = self.improve_policy(pi, board.position, best_actions, board.actions)
-        
-                # Get arrows for Best Actions for this specific state (x,y)
-                self.optimal_actions[x,y] = self.get_arrow(self.pi[x, y, :]) 
+        with self.profiler.phase("policy_improvement"):
+            old_pi = pi.copy()
+
+            ############ COMPUTE the ACTION-value function Q_𝜋(s,a) for every state and action ############
+            q = self.mdp.action_values(v, gamma).reshape(pi.shape)
+
+            # If the Action-value of several actions equals the max, all of them deserve to be taken
+            best_actions = q == q.max(axis=-1, keepdims=True)
+
+            # Define new policy π(a|s), uniform over the best actions of each state
+            pi[:] = best_actions / best_actions.sum(axis=-1, keepdims=True)
+            self.pi = pi
 
+            # Get arrows for Best Actions of every state
+            self.optimal_actions = self.get_arrows(best_actions)
 
+            # Check whether the policy has changed
+            policy_stable = np.array_equal(old_pi, pi)
 
-                # Check whether the policy has changed
-                if (old_pi == self.pi[x,y, :]).all():
-                    policy_stable = True
+        # Update arrows on grid
+        self.render(board, v)
 
         if not policy_stable:
-            # Update arrows on grid
-            board.update_optimal_actions(self.optimal_actions)
-            # Refresh the display
-            board.update()
-            pygame.display.update()
             print(f"\nPolicy improved for all states.")
         else:
-            # Update arrows on grid
-            board.update_optimal_actions(self.optimal_actions)
-            # Refresh the display
-            board.update()
-            pygame.display.update()
             print(f"\nPolicy is now STABLE !")
         return policy_stable
 
+    def replan(self, board, delta=None):
+        """
+        Incremental replanning after a board change, warm-started from the current v and pi.
+
+        Only the states whose transitions or rewards changed are backed up at first
+        (Bellman optimality backups); every state whose value moves by theta or more
+        then wakes up its predecessors, so the sweeps spread outward from the changed
+        cells. When no state is left, the residual of every state is checked once and
+        the states still above theta start a new wave. The policy is finally improved
+        greedily w.r.t. the new value function.
+
+        Args:
+            board (Environment): gridworld environment the current v and pi were computed on
+            delta (BoardDelta): change to apply to the board (None if the board was already changed in place)
+
+        Returns:
+            num_backups (int): number of state backups made (a full sweep costs one per state)
+        """
+        old_mdp = self.mdp
+        if delta is not None:
+            board.apply_delta(delta)
+        if len(board.rewards_list) == 0:
+            board.instanciate_rewards_list()
+        self.mdp = compile_mdp(board, old_mdp.state_space)
+
+        # States whose backup differs on the new board
+        changed = (
+            np.any(old_mdp.next_state != self.mdp.next_state, axis=1)
+            | np.any(old_mdp.rewards != self.mdp.rewards, axis=1)
+            | (old_mdp.terminal != self.mdp.terminal)
+        )
+
+        # ATTENTION: Value function of terminal state must be 0
+        flat_v = self.v.reshape(-1)
+        flat_v[self.mdp.terminal] = 0
+
+        active = np.flatnonzero(changed & ~self.mdp.terminal)
+        num_backups = 0
+        while active.size:
+            while active.size:
+                with self.profiler.phase("replan_backups"):
+                    new_values = np.max(self.mdp.rewards[active] + self.gamma * flat_v[self.mdp.next_state[active]], axis=1)
+                    moved = active[np.abs(new_values - flat_v[active]) >= self.theta]
+                    flat_v[active] = new_values
+                num_backups += active.size
+                self.profiler.count("backups", active.size)
+
+                # Send new value function to grid
+                self.render(board, self.v)
+
+                active = self.mdp.predecessors(moved)
+                active = active[~self.mdp.terminal[active]]
+
+            # Residual check of every state, the small moves were not propagated
+            residual = np.abs(self.mdp.action_values(flat_v, self.gamma).max(axis=1) - flat_v)
+            residual[self.mdp.terminal] = 0
+            active = np.flatnonzero(residual >= self.theta)
+
+        print(f"\nValue function replanned after {num_backups} state backups")
+
+        self.policy_improvement(board, self.v, self.pi, self.gamma)
+        return num_backups
+
+    def save_checkpoint(self, path, counters):
+        """
+        Saves the value function, the policy, the arrows and the run counters.
+
+        Args:
+            path (str): checkpoint directory
+            counters (dict): JSON-serializable counters of the run (iteration, ...)
+        """
+        arrays = {"v": self.v, "pi": self.pi, "optimal_actions": np.asarray(self.optimal_actions, dtype=str)}
+        meta = {"solver": type(self).__name__, "gamma": self.gamma, "theta": self.theta, "counters": counters}
+        checkpoint.save_checkpoint(path, arrays, meta)
+
+    def load_checkpoint(self, path):
+        """
+        Restores the value function, the policy and the arrows saved by save_checkpoint.
+
+        Args:
+            path (str): checkpoint directory
+
+        Returns:
+            counters (dict): counters of the run
+        """
+        arrays, meta = checkpoint.load_checkpoint(path, mmap=False)
+        self.v = np.array(arrays["v"])
+        self.pi = np.array(arrays["pi"])
+        self.optimal_actions = arrays["optimal_actions"].astype(object)
+        return meta["counters"]
+
+    def render(self, board, v=None, final=False):
+        """
+        Sends the value function and the arrows to the grid and draws it, if the render policy says so.
+        The solver only pauses (pauseTime) when a frame is actually drawn. With a snapshot
+        buffer, the frame is published for the UI thread instead, without pausing.
+
+        Args:
+            board (Environment): gridworld environment
+            v (array): numpy array representing the value function (self.v if None)
+            final (bool): True for the last frame of the run
+        """
+        if self.snapshots is not None:
+            if self.render_policy.should_render(final):
+                with self.profiler.phase("snapshot"):
+                    self.snapshots.publish(self.v if v is None else v, self.optimal_actions, board.position, board.walls, board.goal_coord, final, board.rewards_list)
+            return
+        if board.surface is None:
+            return
+        if not self.render_policy.should_render(final):
+            # Keep the window responsive on the skipped frames
+            if self.render_policy.should_pump_events():
+                with self.profiler.phase("events"):
+                    board.handle_events()
+            return
+        with self.profiler.phase("events"):
+            board.handle_events()
+        with self.profiler.phase("draw"):
+            board.update_value_function(self.v if v is None else v)
+            board.update_optimal_actions(self.optimal_actions)
+            board.draw()
+        with self.profiler.phase("display_update"):
+            board.refresh_display()
+        with self.profiler.phase("sleep"):
+            time.sleep(self.pauseTime)
+        self.profiler.count("frames")
+
 
     def bellman_update(self,board, v, old_v, x,y, pi, gamma):
         """
@@ -262,23 +367,43 @@ class PolicyIteration():
             gamma (float): gamma parameter (between 0 and 1)
         """
 
+        s = self.mdp.state_index(x, y)
+
         # The value function on the terminal state always has value 0
-        if x == board.goal_coord[0] and y == board.goal_coord[1]:
+        if self.mdp.terminal[s]:
             return None
 
-        total = 0
+        # Expected reward + discounted value of the next state, over all actions
+        next_values = self.mdp.rewards[s] + gamma * old_v.reshape(-1)[self.mdp.next_state[s]]
 
-        for a in board.actions:
+        # UPDATE OF the VALUE function
+        v[x, y] = np.dot(pi[x, y], next_values)
 
-            # Get next state
-            board_height = board.board_size[0]
-            board_length = board.board_size[1]
-            s_prime_x, s_prime_y = self.get_next_state(x,y,a,board_height,board_length)  
 
-            total += pi[x, y, a] * (board.rewards_list[s_prime_x, s_prime_y] + (gamma * old_v[s_prime_x,s_prime_y]))
+    def bellman_sweep(self, v, pi, gamma):
+        """
+        Applies the Bellman update rule to the value function of every state at once.
+        Same synchronous update as calling bellman_update on each state with old_v = v.
 
-        # UPDATE OF the VALUE function
-        v[x, y] = total
+        Args:
+            v (array): numpy array representing the value function, updated in place
+            pi (array): numpy array representing the policy
+            gamma (float): gamma parameter (between 0 and 1)
+
+        Returns:
+            delta (float): maximum change of the value function over all states
+        """
+        flat_v = v.reshape(-1)
+
+        # Expectation over pi[x, y, a] of the reward + discounted value of the next state
+        new_v = np.einsum("sa,sa->s", pi.reshape(flat_v.size, -1), self.mdp.action_values(flat_v, gamma))
+
+        # The value function on the terminal state always has value 0
+        new_v[self.mdp.terminal] = flat_v[self.mdp.terminal]
+
+        delta = np.max(np.abs(new_v - flat_v))
+        v[:] = new_v.reshape(v.shape)
+        return delta
 
 
     def improve_policy(self,pi, current_state, best_actions, actions):
@@ -371,15 +496,7 @@ class PolicyIteration():
         """
         nb_actions = len(actions)
         pi = 1/nb_actions * np.ones((board_height, board_width,nb_actions)) #One policy per action, for each state => p[x,y] = [0.25,0.25,0.25,0.25] & p[x,y,a] = 0.25
-        opt_act_temp = []
-        for x in range(board_height):
-            opt_act_temp.append("all_arrows")
-            x += 1
-            for y in range(board_width):
-                self.optimal_actions.append(opt_act_temp)
-                y += 1
-
-        self.optimal_actions = np.array(self.optimal_actions)
+        self.optimal_actions = np.full((board_height, board_width), "all_arrows", dtype=object)
         
         return pi, self.optimal_actions
 
@@ -412,7 +529,7 @@ class PolicyIteration():
             elif 0 in best_actions and 2 in best_actions:
                 return "up_right_arrow"
             elif 0 in best_actions and 3 in best_actions:
-                return "up_left_arrow"
+                return "left_up_arrow"
             elif 1 in best_actions and 2 in best_actions:
                 return "down_right_arrow"
             elif 1 in best_actions and 3 in best_actions:
@@ -430,4 +547,23 @@ class PolicyIteration():
             else:
                 return "up_down_right_arrow"
         else:
-            return "all_arrows"
\ No newline at end of file
+            return "all_arrows"
+
+    def get_arrows(self, best_actions):
+        """
+        Returns the arrows of every state at once.
+
+        Args:
+            best_actions (array): boolean array of shape (..., nb_actions), True for the best action(s) of each state
+
+        Returns:
+            arrows (array): object array of shape (...) with the arrow name of each state
+        """
+        nb_actions = best_actions.shape[-1]
+
+        # One arrow per subset of best actions, indexed by the bitmask sum(2**a)
+        arrow_table = np.empty(2 ** nb_actions, dtype=object)
+        for mask in range(1, 2 ** nb_actions):
+            arrow_table[mask] = self.get_arrow(np.array([(mask >> a) & 1 for a in range(nb_actions)]))
+
+        return arrow_table[best_actions @ (1 << np.arange(nb_actions))]
@@ -0,0 +1,120 @@
+"""
+Prioritized sweeping for tabular Q-learning on the Gridworld problem.
+
+We are assuming the Q_learning board semantics, and that the board is deterministic:
+    - a learned model keeps the last observed (reward, next state) of every (s, a);
+    - the predecessors of a state s are the pairs (s', a') the model sends to s;
+    - each real step is a usual Q-learning update; the predecessors of the updated
+      state are then queued with priority |TD error|, and up to sweep_steps queued
+      pairs are updated, highest priority first, queueing their own predecessors.
+When the wall changes, the pairs whose model changed get a large TD error, so the
+updates follow the states whose values the new wall actually invalidated instead
+of waiting for random exploration to revisit them.
+"""
+import heapq
+import numpy as np
+from q_learner import Q_learning
+from replay_buffer import TabularModel
+
+
+class PrioritizedSweeping(Q_learning):
+    def __init__(self, *args, sweep_steps=10, priority_threshold=1e-4, **kwargs):
+        """
+        Initialize our PrioritizedSweeping class (same arguments as Q_learning).
+
+        Args:
+            sweep_steps (int): number of queued updates after each real step
+            priority_threshold (float): pairs whose |TD error| is not above it are not queued
+        """
+        super().__init__(*args, **kwargs)
+        self.sweep_steps = sweep_steps
+        self.priority_threshold = priority_threshold
+        self.model = TabularModel(self.state_space.num_states, self.num_actions)
+        self.predecessors = [set() for _ in range(self.state_space.num_states)]
+        self.queue = []  # heap of (-priority, s * A + a), may hold stale entries
+        self.priorities = np.zeros(self.state_space.num_states * self.num_actions)
+
+    def td_error(self, state, action):
+        """
+        TD error of the pair (state, action) under the model.
+        """
+        next_state = self.model.next_states[state, action]
+        return self.model.rewards[state, action] + self.gamma * np.max(self.w[next_state]) - self.w[state, action]
+
+    def push(self, state, action):
+        """
+        Queues the pair (state, action) if its |TD error| is above the threshold
+        (and above its current priority).
+        """
+        priority = abs(self.td_error(state, action))
+        pair = state * self.num_actions + action
+        if priority > self.priority_threshold and priority > self.priorities[pair]:
+            self.priorities[pair] = priority
+            heapq.heappush(self.queue, (-priority, pair))
+
+    def update_model(self, state, action, reward, next_state):
+        """
+        Records a real transition in the model and keeps the predecessor sets in sync.
+        """
+        old_next_state = self.model.next_states[state, action]
+        pair = state * self.num_actions + action
+        if old_next_state >= 0:
+            self.predecessors[old_next_state].discard(pair)
+        self.predecessors[next_state].add(pair)
+        self.model.add(state, action, reward, next_state)
+
+    def sweep(self):
+        """
+        Runs up to sweep_steps updates of the highest priority pairs.
+
+        Returns:
+            num_updates (int): number of updates made
+        """
+        num_updates = 0
+        while self.queue and num_updates < self.sweep_steps:
+            priority, pair = heapq.heappop(self.queue)
+            if -priority != self.priorities[pair]:
+                continue  # stale entry, the pair was queued again with a higher priority
+            self.priorities[pair] = 0.0
+            state, action = divmod(pair, self.num_actions)
+            self.w[state, action] += self.alpha * self.td_error(state, action)
+            num_updates += 1
+
+            for predecessor in self.predecessors[state]:
+                self.push(*divmod(predecessor, self.num_actions))
+        return num_updates
+
+    def master_func(self, current_features, next_features, reward, action):
+        # Real TD update (always applied, whatever its TD error), then sweep
+        # the pairs leading to the state whose value just changed
+        super().master_func(current_features, next_features, reward, action)
+        self.update_model(current_features, action, reward, next_features)
+        for predecessor in self.predecessors[current_features]:
+            self.push(*divmod(predecessor, self.num_actions))
+        self.sweep()
+
+    def save_checkpoint(self, path, counters, arrays={}):
+        # The learned model is saved with the Q-table; the queue is not,
+        # it restarts empty on resume
+        arrays = dict(arrays, model_next_states=self.model.next_states, model_rewards=self.model.rewards, model_pairs=self.model.pairs)
+        super().save_checkpoint(path, dict(counters, model_num_pairs=self.model.num_pairs), arrays)
+
+    def load_checkpoint(self, path):
+        counters, arrays = super().load_checkpoint(path)
+        self.model.next_states[:] = arrays.pop("model_next_states")
+        self.model.rewards[:] = arrays.pop("model_rewards")
+        self.model.pairs[:] = arrays.pop("model_pairs")
+        self.model.num_pairs = counters["model_num_pairs"]
+
+        # Rebuild the predecessor sets from the model
+        self.predecessors = [set() for _ in range(self.state_space.num_states)]
+        for pair in self.model.pairs[:self.model.num_pairs]:
+            state, action = divmod(int(pair), self.num_actions)
+            self.predecessors[self.model.next_states[state, action]].add(int(pair))
+        return counters, arrays
+
+    def batched_q_learning(self, num_envs=64):
+        raise ValueError("prioritized sweeping only runs with q_learning")
+
+    def fast_q_learning(self, block_size=65536, jit=True):
+        raise ValueError("prioritized sweeping only runs with q_learning")
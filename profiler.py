@@ -0,0 +1,148 @@
+"""
+Per-phase timing instrumentation of the solvers.
+
+A Profiler accumulates, for one run:
+    - named phase timers (sweeps, policy improvement, env steps, drawing,
+      display update, pause, event pump, ...), used as `with profiler.phase(name):`;
+    - named counters (sweeps, backups, env steps, frames drawn, ...).
+Nested phases are timed inclusively (the outer phase includes the inner one).
+A disabled profiler (the solvers' default) hands out one shared no-op context,
+so the instrumented code costs a method call per phase. The results are written
+as a JSON summary and, if trace=True, as a Chrome trace-event timeline
+(chrome://tracing or https://ui.perfetto.dev).
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+NULL_PHASE = contextlib.nullcontext()
+
+
+class Phase():
+    def __init__(self, profiler, name):
+        """
+        Reusable timer of one named phase.
+        """
+        self.profiler = profiler
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        duration = end - self.start
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if self.profiler.trace:
+            self.profiler.add_event(self.name, self.start, duration)
+
+
+class Profiler():
+    def __init__(self, enabled=True, trace=False, max_events=1000000):
+        """
+        Initialize the profiler of a run.
+
+        Args:
+            enabled (bool): time the phases and count the events (everything is a no-op otherwise)
+            trace (bool): also record one timeline event per phase call
+            max_events (int): maximum number of timeline events kept (the later ones are dropped)
+        """
+        self.enabled = enabled
+        self.trace = enabled and trace
+        self.max_events = max_events
+
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+        self.dropped_events = 0
+        self.start_time = time.perf_counter()
+
+    def phase(self, name):
+        """
+        Returns the context manager timing the phase `name`.
+        """
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+        return phase
+
+    def count(self, name, n=1):
+        """
+        Adds n to the counter `name`.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def add_event(self, name, start, duration):
+        if len(self.events) < self.max_events:
+            self.events.append((name, start, duration, threading.get_ident()))
+        else:
+            self.dropped_events += 1
+
+    def summary(self):
+        """
+        Returns the JSON-serializable summary of the run so far.
+
+        Returns:
+            summary (dict): wall time, {phase: calls, total, mean, max, share of the wall time} and counters
+        """
+        wall_time = time.perf_counter() - self.start_time
+        phases = {
+            name: {
+                "calls": phase.calls,
+                "total_s": phase.total,
+                "mean_s": phase.total / phase.calls if phase.calls else 0.0,
+                "max_s": phase.max,
+                "share": phase.total / wall_time if wall_time > 0 else 0.0,
+            }
+            for name, phase in sorted(self.phases.items(), key=lambda item: -item[1].total)
+        }
+        return {"wall_time_s": wall_time, "phases": phases, "counters": dict(self.counters)}
+
+    def write_summary(self, path):
+        """
+        Writes the summary as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_trace(self, path):
+        """
+        Writes the recorded phase calls in the Chrome trace-event format
+        (complete events, timestamps in microseconds from the profiler creation).
+        """
+        pid = os.getpid()
+        events = [
+            {"name": name, "ph": "X", "ts": (start - self.start_time) * 1e6, "dur": duration * 1e6, "pid": pid, "tid": tid}
+            for name, start, duration, tid in self.events
+        ]
+        events.extend(
+            {"name": name, "ph": "C", "ts": (time.perf_counter() - self.start_time) * 1e6, "pid": pid, "args": {name: value}}
+            for name, value in self.counters.items()
+        )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_events": self.dropped_events}}, f)
+
+    def report(self):
+        """
+        Returns a short text table of the phases, by decreasing total time.
+        """
+        summary = self.summary()
+        lines = [f"Wall time: {summary['wall_time_s']:.3f} s"]
+        for name, phase in summary["phases"].items():
+            lines.append(f"  {name:<20} {phase['total_s']:10.4f} s {100 * phase['share']:6.1f}% {phase['calls']:10d} calls")
+        for name, value in summary["counters"].items():
+            lines.append(f"  {name:<20} {value:>10}")
+        return "\n".join(lines)
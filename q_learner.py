@@ -1,10 +1,19 @@
+import contextlib
 import numpy as np
 from gridworld import Grid_World
-import pygame, sys, time
-from pygame.locals import *
+from batch_gridworld import BatchGridWorld
+from eligibility_traces import SparseTraces
+from replay_buffer import ReplayBuffer, TabularModel
+from early_stopping import EarlyStopping
+from metrics_log import MetricsWriter
+import checkpoint
+from render_policy import RenderPolicy
+from profiler import Profiler
+from state_space import StateSpace
+import time
 
 class Q_learning():
-    def __init__(self, alpha = 0.1, gamma = 0.99, lmbda=0.1, epsilon = 0.1, n = 54, num_actions = 4, num_episodes = 200,surface= (600,600), board_size = [10,10], start_coord = (0,0),original_wall = [],new_wall=[],pauseTime=0.01,render_env=False,transition_timestep=1000,final_epsilon=0.01,anneal_epsilon_episodes=10,epsilon_anneal_rate=0):
+    def __init__(self, alpha = 0.1, gamma = 0.99, lmbda=0.0, epsilon = 0.1, n = 54, num_actions = 4, num_episodes = 200,surface= (600,600), board_size = [10,10], start_coord = (0,0),original_wall = [],new_wall=[],pauseTime=0.01,render_env=False,transition_timestep=1000,final_epsilon=0.01,anneal_epsilon_episodes=10,epsilon_anneal_rate=0,render_policy=None,trace="replacing",trace_cutoff=1e-3,planning_steps=0,planning="model",buffer_size=100000,epsilon_schedule="linear",stop_patience=None,stop_td_error=None,stop_check_every=1,metrics_path=None,checkpoint_path=None,checkpoint_every=100,profiler=None,snapshots=None,goal_coord=(9,9)):
         self.alpha = alpha
         self.gamma = gamma
         self.lmbda = lmbda
@@ -15,6 +24,7 @@ class Q_learning():
         self.surface = surface
         self.board_size = board_size
         self.start_coord = start_coord
+        self.goal_coord = goal_coord  # Grid_World default goal
         self.original_wall = original_wall
         self.new_wall = new_wall
         self.pauseTime = pauseTime  # smaller is faster game
@@ -23,9 +33,51 @@ class Q_learning():
         self.final_epsilon = final_epsilon
         self.anneal_epsilon_episodes = anneal_epsilon_episodes
         self.epsilon_anneal_rate = epsilon_anneal_rate
+        # "linear" (epsilon -= rate) or "exponential" (epsilon *= 1 - rate)
+        # decay per episode, over the first anneal_epsilon_episodes episodes
+        # of a phase (from epsilon at the start, from 0.5 after the wall change);
+        # epsilon_anneal_rate=None derives the rate from each phase's start
+        if epsilon_schedule not in ("linear", "exponential"):
+            raise ValueError(f"unknown epsilon schedule {epsilon_schedule!r}")
+        self.epsilon_schedule = epsilon_schedule
+        self.initial_epsilon = epsilon
+        # Stop when the greedy policy is unchanged for stop_patience checks,
+        # or when the max TD error falls under stop_td_error
+        self.early_stopping = EarlyStopping(stop_patience, stop_td_error, stop_check_every)
+        # Binary stream of the per-episode metrics (none if None)
+        self.metrics_path = metrics_path
+        # Checkpoint directory written every checkpoint_every episodes (none if None)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.render_policy = render_policy if render_policy is not None else RenderPolicy()  # which steps are drawn
+        # Phase timers and counters of the runs (disabled if None)
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        # SnapshotBuffer the frames are published to for a UI thread,
+        # instead of being drawn (the runs are then headless)
+        self.snapshots = snapshots
 
-        self.w = np.zeros((n,num_actions))
-        self.e = np.zeros((n,num_actions))
+        # One row per cell that is free in the original or the new layout,
+        # so the same Q-table is used before and after the wall change
+        # (n is kept for compatibility, the table size comes from the walls)
+        self.state_space = StateSpace.from_wall_sets(board_size, [original_wall, new_wall])
+        self.w = np.zeros((self.state_space.num_states,num_actions))
+        # Watkins Q(lambda) when lmbda > 0, with sparse "replacing" or
+        # "accumulating" traces (one-step Q-learning otherwise)
+        if trace not in ("replacing", "accumulating"):
+            raise ValueError(f"unknown trace type {trace!r}")
+        self.traces = SparseTraces(gamma * lmbda, trace == "replacing", trace_cutoff) if lmbda > 0 else None
+        # Dyna-Q: planning_steps simulated updates after each real step, drawn
+        # from a learned tabular "model" or from a "buffer" of past transitions
+        # (no memory is allocated without planning)
+        self.planning_steps = planning_steps
+        if planning not in ("model", "buffer"):
+            raise ValueError(f"unknown planning source {planning!r}")
+        self.memory = None
+        if planning_steps > 0:
+            if planning == "model":
+                self.memory = TabularModel(self.state_space.num_states, num_actions)
+            else:
+                self.memory = ReplayBuffer(buffer_size)
         self.delta = 0.0
         self.q_value = 0.0
         self.next_q_value = 0.0
@@ -57,7 +109,17 @@ class Q_learning():
         self.delta = reward + self.gamma*self.next_q_value - self.q_value
 
     def weight_update(self, features, action):
-        self.w[features, action] += self.alpha*self.delta
+        if self.traces is None:
+            self.w[features, action] += self.alpha*self.delta
+        else:
+            self.traces.visit(features, action)
+            self.traces.update(self.w, self.alpha*self.delta)
+
+    def cut_traces(self, features, action):
+        # Watkins Q(lambda): the traces only follow the greedy policy, they
+        # are cut when the chosen action is not a greedy one
+        if self.traces is not None and self.w[features, action] < np.max(self.w[features, :]):
+            self.traces.clear()
 
     def sample_action(self, features,nb_actions):
         maxQ, greedy_action = self.greedy_Q(features=features)
@@ -80,9 +142,102 @@ class Q_learning():
         self.weight_update(features=current_features, action=action)
 
     def get_features(self,pos):
-        return pos[0] * (self.board_size[1] - 1) + pos[1]
+        return self.state_space.index[pos[0], pos[1]]
+
+    def annealed_epsilon(self, start_epsilon, episodes):
+        # Epsilon after `episodes` episodes of a phase that started at
+        # start_epsilon (no annealing when epsilon_anneal_rate is 0). When
+        # epsilon_anneal_rate is None, the rate is derived from start_epsilon
+        # so that final_epsilon is reached after anneal_epsilon_episodes
+        rate = self.epsilon_anneal_rate
+        if rate is None:
+            if start_epsilon <= self.final_epsilon or self.anneal_epsilon_episodes <= 0:
+                return max(self.final_epsilon, start_epsilon)
+            if self.epsilon_schedule == "linear":
+                rate = (start_epsilon - self.final_epsilon) / self.anneal_epsilon_episodes
+            else:
+                rate = 1 - (self.final_epsilon / start_epsilon) ** (1 / self.anneal_epsilon_episodes)
+        if rate <= 0:
+            return start_epsilon
+        episodes = min(episodes, self.anneal_epsilon_episodes)
+        if self.epsilon_schedule == "linear":
+            epsilon = start_epsilon - rate * episodes
+        else:
+            epsilon = start_epsilon * (1 - rate) ** episodes
+        return max(self.final_epsilon, epsilon)
+
+    def save_checkpoint(self, path, counters, arrays={}):
+        # Save the Q-table, the early stopping checks, the Dyna-Q memory
+        # (when planning is on), the RNG state and the run counters (plus
+        # the extra arrays, e.g. the per-episode metrics)
+        tables = {"w": self.w}
+        tables.update(arrays)
+        stop_counters, stop_policy = self.early_stopping.state()
+        if stop_policy is not None:
+            tables["stop_policy"] = stop_policy
+        meta = {"solver": type(self).__name__, "epsilon": float(self.epsilon), "counters": counters, "early_stopping": stop_counters, "memory": {}}
+        if self.planning_steps > 0:
+            for name, value in vars(self.memory).items():
+                if isinstance(value, np.ndarray):
+                    tables["memory_" + name] = value
+                else:
+                    meta["memory"][name] = value.item() if isinstance(value, np.generic) else value
+        checkpoint.save_checkpoint(path, tables, meta)
 
-    def q_learning(self):
+    def load_checkpoint(self, path):
+        # Restore what save_checkpoint saved (RNG state included) and
+        # return the run counters and the extra arrays
+        arrays, meta = checkpoint.load_checkpoint(path, mmap=False)
+        self.w[:] = arrays.pop("w")
+        self.epsilon = meta["epsilon"]
+        self.early_stopping.restore(meta["early_stopping"], arrays.pop("stop_policy", None))
+        for name in list(arrays):
+            if name.startswith("memory_"):
+                getattr(self.memory, name[len("memory_"):])[...] = arrays.pop(name)
+        for name, value in meta["memory"].items():
+            setattr(self.memory, name, value)
+        return meta["counters"], arrays
+
+    def open_metrics(self):
+        # Metrics stream of a run, appended to metrics_path, to be used as
+        # `with self.open_metrics() as metrics:` (metrics is None if unset),
+        # so the buffered records are written even if the run is interrupted
+        if self.metrics_path is None:
+            return contextlib.nullcontext()
+        return MetricsWriter(self.metrics_path)
+
+    def wall_change_pending(self, timesteps):
+        # Early stopping waits for the wall change, when there is one
+        return timesteps < self.transition_timestep and not np.array_equal(self.new_wall, self.original_wall)
+
+    def render(self, board, final=False):
+        # Draw the board, pump the window events and pause between frames,
+        # only for the steps selected by the render policy (or publish the
+        # frame for the UI thread, without pausing)
+        if self.snapshots is not None:
+            if self.render_policy.should_render(final):
+                with self.profiler.phase("snapshot"):
+                    self.snapshots.publish(position=board.position, walls=board.walls, goal=board.goal_coord, final=final)
+            return
+        if board.surface is None:
+            return
+        if not self.render_policy.should_render(final):
+            # Keep the window responsive on the skipped frames
+            if self.render_policy.should_pump_events():
+                with self.profiler.phase("events"):
+                    board.handle_events()
+            return
+        with self.profiler.phase("events"):
+            board.handle_events()
+        with self.profiler.phase("draw"):
+            board.draw()
+        with self.profiler.phase("display_update"):
+            board.refresh_display()
+        with self.profiler.phase("sleep"):
+            time.sleep(self.pauseTime)
+        self.profiler.count("frames")
+
+    def q_learning(self, resume=False):
         # Data storage initialization
         return_mem = []
         timestep_mem = []
@@ -90,82 +245,330 @@ class Q_learning():
         timesteps = 0
         flag = 0
 
-        # Loop forever
-        for i_episode in range(self.num_episodes):
-            # create and initialize objects
-            gameOver = False
-            #Set new wall after certain nb of timesteps + set exploration_epsilon higher
-            if timesteps >= self.transition_timestep:
-                board = Grid_World(self.surface, self.board_size, self.new_wall,self.start_coord)
-                self.epsilon = 0.5
-            else:
-                board = Grid_World(self.surface, self.board_size, self.original_wall,self.start_coord)
+        phase_epsilon = self.initial_epsilon
+        phase_start = 0  # first episode of the current epsilon phase
+        wall_changed = False
+        first_episode = 0
+        self.early_stopping.reset()
+        with self.open_metrics() as metrics:
+            # Resume from the last checkpoint of a preempted run
+            if resume and self.checkpoint_path is not None and checkpoint.checkpoint_exists(self.checkpoint_path):
+                counters, arrays = self.load_checkpoint(self.checkpoint_path)
+                return_mem = arrays["returns"].tolist()
+                timestep_mem = arrays["lengths"].tolist()
+                first_episode, timesteps, flag = counters["episode"], counters["timesteps"], counters["flag"]
+                wall_changed, phase_epsilon, phase_start = counters["wall_changed"], counters["phase_epsilon"], counters["phase_start"]
+                print("Resuming Q-learning from episode ", first_episode + 1)
+                # The episodes logged after the checkpoint are run again
+                if metrics is not None:
+                    metrics.truncate(first_episode)
 
-            # Draw objects
-            board.draw()
+            # Loop forever
+            for i_episode in range(first_episode, self.num_episodes):
+                # create and initialize objects
+                gameOver = False
+                #Set new wall after certain nb of timesteps + set exploration_epsilon higher
+                with self.profiler.phase("board_setup"):
+                    if timesteps >= self.transition_timestep:
+                        board = Grid_World(self.surface, self.board_size, self.new_wall,self.start_coord,self.goal_coord)
+                    else:
+                        board = Grid_World(self.surface, self.board_size, self.original_wall,self.start_coord,self.goal_coord)
+                if timesteps >= self.transition_timestep and not wall_changed:
+                    wall_changed = True
+                    phase_epsilon, phase_start = 0.5, i_episode
+                    self.early_stopping.reset()
+                self.epsilon = self.annealed_epsilon(phase_epsilon, i_episode - phase_start)
 
-            # Refresh the display
-            pygame.display.update()
+                # Draw objects
+                self.render(board)
 
-            # Q learner specific initializations
-            current_state = board.position
-            current_features = self.get_features(board.position)
-            episode_return = 0
-            episode_timesteps = 0
+                # Q learner specific initializations
+                current_state = board.position
+                current_features = self.get_features(board.position)
+                episode_return = 0
+                episode_timesteps = 0
+                max_td_error = 0.0
+                if self.traces is not None:
+                    self.traces.clear()
 
-            while not gameOver:
-                # Handle events
-                for event in pygame.event.get():
-                    if event.type == QUIT:
-                        pygame.quit()
-                        sys.exit()
-                        # Handle additional events
-                # Choose and execute an action
-                action = self.sample_action(current_features,board.actions)
-                board.step(action)
+                while not gameOver:
+                    # Choose and execute an action
+                    with self.profiler.phase("action_selection"):
+                        action = self.sample_action(current_features,board.actions)
+                        self.cut_traces(current_features, action)
+                    with self.profiler.phase("env_step"):
+                        board.step(action)
 
-                # Transition to next state
-                next_state = board.position
-                next_features = self.get_features(next_state)
+                        # Transition to next state
+                        next_state = board.position
+                        next_features = self.get_features(next_state)
+                    self.profiler.count("env_steps")
+
+                    # Q-learning update
+                    with self.profiler.phase("update"):
+                        self.master_func(current_features, next_features, board.reward_qlearning, action)
+                    max_td_error = max(max_td_error, abs(self.delta))
+                    if self.planning_steps > 0:
+                        with self.profiler.phase("planning"):
+                            self.memory.add(current_features, action, board.reward_qlearning, next_features)
+                            self.plan()
+                        self.profiler.count("planning_updates", self.planning_steps)
+
+                    current_features = next_features
+
+                    episode_return += board.reward_qlearning
+                    episode_timesteps += 1
+                    timesteps += 1
+
+                    if timesteps >= self.transition_timestep and not flag: #If timesteps are over a certain milestone,
+                        flag = 1
+                        break
+
+                    # print "Board position = ", board.position, " Action = ", action_dict[str(action)],\
+                    #    "Q-value = ", self.q_value, "TD Error = ", self.delta, "Timesteps = ", episode_timesteps
+
+                    # Update and draw objects for next frame
+                    gameOver = board.game_over()
+                    if not gameOver:
+                        self.render(board)
+                print(
+                    "Episode ",
+                    i_episode + 1,
+                    " ended in ",
+                    episode_timesteps,
+                    " timesteps and return = ",
+                    episode_return,
+                    "Total Timesteps = ",
+                    timesteps,
+                )
+                return_mem.append(episode_return)
+                timestep_mem.append(episode_timesteps)
+                self.profiler.count("episodes")
+                if metrics is not None:
+                    with self.profiler.phase("metrics"):
+                        metrics.log(i_episode, episode_return, episode_timesteps, self.epsilon)
+                # eval_return, eval_time = eval_policy(self, surface)
+                # greedy_return_mem.append([eval_return, eval_time])
+
+                # The episode cut by the wall change is not a converged one
+                # (checked before the checkpoint, which saves the checks)
+                converged = False
+                if flag == 0 or wall_changed:
+                    converged = self.early_stopping.update(self.w, max_td_error) and not self.wall_change_pending(timesteps)
+
+                if self.checkpoint_path is not None and (i_episode + 1) % self.checkpoint_every == 0:
+                    counters = {
+                        "episode": i_episode + 1, "timesteps": timesteps, "flag": flag, "wall_changed": wall_changed,
+                        "phase_epsilon": phase_epsilon, "phase_start": phase_start,
+                    }
+                    with self.profiler.phase("checkpoint"):
+                        self.save_checkpoint(self.checkpoint_path, counters, {"returns": return_mem, "lengths": timestep_mem})
+                        # The metrics stream holds every checkpointed episode
+                        if metrics is not None:
+                            metrics.flush()
+
+                if converged:
+                    print("Q-learning converged after ", i_episode + 1, " episodes")
+                    break
+        # Always show the final frame (if any episode was left to run)
+        if first_episode < self.num_episodes:
+            self.render(board, final=True)
+        np.savetxt("Episode_returns", return_mem)
+        np.savetxt("Episode_time", timestep_mem)
+        np.savetxt("weights_q_learner", self.w)
+        return np.array(return_mem), np.array(timestep_mem)
 
-                # Q-learning update
-                self.master_func(current_features, next_features, board.reward_qlearning, action)
+    def batched_sample_actions(self, states):
+        # Epsilon-greedy actions for a batch of flat states, with a random
+        # action where all the Q-values of a state are equal (as greedy_Q)
+        q_rows = self.w[states]
+        actions = np.argmax(q_rows, axis=1)
+        explore = (np.random.rand(states.size) < self.epsilon) | np.all(q_rows == q_rows[:, :1], axis=1)
+        actions[explore] = np.random.randint(self.num_actions, size=np.count_nonzero(explore))
+        return actions
 
-                current_features = next_features
+    def plan(self):
+        # Dyna-Q planning: planning_steps simulated transitions drawn from
+        # the memory, applied as one batched update
+        self.batched_update(*self.memory.sample(self.planning_steps))
 
-                episode_return += board.reward_qlearning
+    def batched_update(self, states, actions, rewards, next_states):
+        # TD errors of all the transitions at once, accumulated per
+        # (state, action) pair and scattered into the Q-table. A pair hit by
+        # several environments moves by alpha times its mean TD error, so
+        # that the step size does not grow with the number of environments.
+        deltas = rewards + self.gamma * np.max(self.w[next_states], axis=1) - self.w[states, actions]
+        pairs, inverse, counts = np.unique(states * self.num_actions + actions, return_inverse=True, return_counts=True)
+        delta_sums = np.bincount(inverse, weights=deltas)
+        self.w.reshape(-1)[pairs] += self.alpha * delta_sums / counts
+        return deltas
+
+    def batched_q_learning(self, num_envs=64):
+        # Run num_envs environments in lockstep (headless) until
+        # num_episodes episodes are completed. Both layouts share the
+        # agent's state space, so states index the Q-table directly.
+        # One-step updates only (no eligibility traces).
+        if self.traces is not None:
+            raise ValueError("batched Q-learning does not support eligibility traces, use lmbda = 0")
+
+        return_mem = []
+        timestep_mem = []
+        timesteps = 0
+        flag = 0
+
+        env = BatchGridWorld(self.board_size, self.original_wall, self.start_coord, self.goal_coord, num_envs=num_envs, auto_reset=True, state_space=self.state_space)
+        states = env.state.copy()
+        episode_returns = np.zeros(num_envs)
+        episode_timesteps = np.zeros(num_envs, dtype=np.int64)
+        episode_td_errors = np.zeros(num_envs)
+        phase_epsilon = self.initial_epsilon
+        phase_start = 0  # completed episodes when the current epsilon phase started
+        self.early_stopping.reset()
+        stop = False
+        with self.open_metrics() as metrics:
+            while len(return_mem) < self.num_episodes and not stop:
+                #Set new wall after certain nb of timesteps + set exploration_epsilon higher
+                if timesteps >= self.transition_timestep and not flag:
+                    flag = 1
+                    env = BatchGridWorld(self.board_size, self.new_wall, self.start_coord, self.goal_coord, num_envs=num_envs, auto_reset=True, state_space=self.state_space)
+                    env.state[:] = states
+                    phase_epsilon, phase_start = 0.5, len(return_mem)
+                    self.early_stopping.reset()
+                self.epsilon = self.annealed_epsilon(phase_epsilon, len(return_mem) - phase_start)
+
+                with self.profiler.phase("action_selection"):
+                    actions = self.batched_sample_actions(states)
+                with self.profiler.phase("env_step"):
+                    next_states, rewards, dones = env.step(actions)
+                self.profiler.count("env_steps", num_envs)
+
+                # Q-learning update of all the transitions
+                with self.profiler.phase("update"):
+                    deltas = self.batched_update(states, actions, rewards, next_states)
+                np.maximum(episode_td_errors, np.abs(deltas), out=episode_td_errors)
+                if self.planning_steps > 0:
+                    with self.profiler.phase("planning"):
+                        self.memory.add_batch(states, actions, rewards, next_states)
+                        self.plan()
+                    self.profiler.count("planning_updates", self.planning_steps)
+
+                episode_returns += rewards
                 episode_timesteps += 1
-                timesteps += 1
+                timesteps += num_envs
+
+                if dones.any():
+                    self.profiler.count("episodes", np.count_nonzero(dones))
+                    if metrics is not None:
+                        with self.profiler.phase("metrics"):
+                            metrics.log_batch(len(return_mem), episode_returns[dones], episode_timesteps[dones], self.epsilon)
+                    return_mem.extend(episode_returns[dones].tolist())
+                    timestep_mem.extend(episode_timesteps[dones].tolist())
+                    stop = self.early_stopping.update(self.w, episode_td_errors[dones].max(), np.count_nonzero(dones))
+                    stop = stop and not self.wall_change_pending(timesteps)
+                    episode_returns[dones] = 0
+                    episode_timesteps[dones] = 0
+                    episode_td_errors[dones] = 0
+
+                # Agents that reached the goal were sent back to the start by the env
+                states = env.state.copy()
 
-                if timesteps >= self.transition_timestep and not flag: #If timesteps are over a certain milestone,
+        return_mem = np.array(return_mem[:self.num_episodes])
+        timestep_mem = np.array(timestep_mem[:self.num_episodes])
+        print("Batched Q-learning: ", len(return_mem), " episodes in ", timesteps, " timesteps over ", num_envs, " environments")
+        np.savetxt("Episode_returns", return_mem)
+        np.savetxt("Episode_time", timestep_mem)
+        np.savetxt("weights_q_learner", self.w)
+        return return_mem, timestep_mem
+
+    def fast_q_learning(self, block_size=65536, jit=True):
+        # Same learning as q_learning, headless, with whole episodes run by
+        # the episode kernel over flat arrays (numba-compiled when jit is
+        # True and numba is installed). The random draws are made here one
+        # block of steps at a time; a block never crosses the wall change.
+        # One-step updates only (no eligibility traces, no planning).
+        if self.traces is not None:
+            raise ValueError("fast Q-learning does not support eligibility traces, use lmbda = 0")
+        if self.planning_steps > 0:
+            raise ValueError("fast Q-learning does not support planning, use planning_steps = 0")
+        # numba is only loaded by this runner, the others never pay for it
+        from episode_kernel import run_episodes, run_episodes_numpy
+
+        kernel = run_episodes if jit else run_episodes_numpy
+        tables = [
+            BatchGridWorld(self.board_size, walls, self.start_coord, self.goal_coord, state_space=self.state_space)
+            for walls in (self.original_wall, self.new_wall)
+        ]
+        env = tables[0]
+
+        return_mem = np.zeros(self.num_episodes)
+        timestep_mem = np.zeros(self.num_episodes, dtype=np.int64)
+        td_error_mem = np.zeros(self.num_episodes)
+        epsilons = np.array([self.annealed_epsilon(self.initial_epsilon, k) for k in range(self.num_episodes)])
+        num_done = 0
+        timesteps = 0
+        flag = 0
+        state, episode_return, episode_length, episode_td_error = env.start_index, 0.0, 0, 0.0
+        self.early_stopping.reset()
+        with self.open_metrics() as metrics:
+            while num_done < self.num_episodes:
+                num_steps = block_size
+                if not flag:
+                    num_steps = int(min(block_size, max(self.transition_timestep - timesteps, 1)))
+
+                # With early stopping, the kernel returns on every checked episode
+                limit = self.num_episodes
+                if self.early_stopping.enabled:
+                    check_every = self.early_stopping.check_every
+                    limit = min(limit, num_done + check_every - self.early_stopping.episodes % check_every)
+                    mean_length = timesteps / num_done if num_done else 1024
+                    num_steps = min(num_steps, max(1024, int(2 * mean_length * (limit - num_done))))
+
+                with self.profiler.phase("random_draws"):
+                    explore_draws = np.random.rand(num_steps)
+                    action_draws = np.random.randint(self.num_actions, size=num_steps)
+
+                first_new = num_done
+                with self.profiler.phase("kernel"):
+                    num_done, used, state, episode_return, episode_length, episode_td_error = kernel(
+                        self.w, env.next_state, env.start_index, env.goal_index, state, episode_return, episode_length, episode_td_error,
+                        self.alpha, self.gamma, epsilons, explore_draws, action_draws,
+                        return_mem[:limit], timestep_mem[:limit], td_error_mem[:limit], num_done,
+                    )
+                timesteps += used
+                self.profiler.count("env_steps", used)
+                self.profiler.count("episodes", num_done - first_new)
+
+                #Set new wall after certain nb of timesteps + set exploration_epsilon higher
+                if timesteps >= self.transition_timestep and not flag:
                     flag = 1
+                    # The running episode is cut, as in q_learning
+                    if episode_length > 0 and num_done < self.num_episodes:
+                        return_mem[num_done] = episode_return
+                        timestep_mem[num_done] = episode_length
+                        td_error_mem[num_done] = episode_td_error
+                        num_done += 1
+                        self.profiler.count("episodes")
+                    if metrics is not None:
+                        metrics.log_batch(first_new, return_mem[first_new:num_done], timestep_mem[first_new:num_done], epsilons[first_new:num_done])
+                    env = tables[1]
+                    state, episode_return, episode_length, episode_td_error = env.start_index, 0.0, 0, 0.0
+                    epsilons[num_done:] = [self.annealed_epsilon(0.5, k) for k in range(self.num_episodes - num_done)]
+                    self.early_stopping.reset()
+                    continue
+
+                if num_done == first_new:
+                    continue
+                if metrics is not None:
+                    metrics.log_batch(first_new, return_mem[first_new:num_done], timestep_mem[first_new:num_done], epsilons[first_new:num_done])
+                stop = self.early_stopping.update(self.w, td_error_mem[first_new:num_done].max(), num_done - first_new)
+                if stop and not self.wall_change_pending(timesteps):
+                    print("Fast Q-learning converged after ", num_done, " episodes")
+                    return_mem, timestep_mem = return_mem[:num_done], timestep_mem[:num_done]
                     break
 
-                # print "Board position = ", board.position, " Action = ", action_dict[str(action)],\
-                #    "Q-value = ", self.q_value, "TD Error = ", self.delta, "Timesteps = ", episode_timesteps
-
-                # Update and draw objects for next frame
-                gameOver = board.update()
-
-                # Refresh the display
-                pygame.display.update()
-
-                # Set the frame speed by pausing between frames
-                time.sleep(self.pauseTime)
-            print(
-                "Episode ",
-                i_episode + 1,
-                " ended in ",
-                episode_timesteps,
-                " timesteps and return = ",
-                episode_return,
-                "Total Timesteps = ",
-                timesteps,
-            )
-            return_mem.append(episode_return)
-            timestep_mem.append(episode_timesteps)
-            # eval_return, eval_time = eval_policy(self, surface)
-            # greedy_return_mem.append([eval_return, eval_time])
+        self.epsilon = epsilons[num_done - 1]
+        print("Fast Q-learning: ", num_done, " episodes in ", timesteps, " timesteps")
         np.savetxt("Episode_returns", return_mem)
         np.savetxt("Episode_time", timestep_mem)
         np.savetxt("weights_q_learner", self.w)
+        return return_mem, timestep_mem
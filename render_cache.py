@@ -0,0 +1,58 @@
+# Render cache
+#
+# Fonts are built once per size and rendered text surfaces are memoized
+# by (text, colour, size), so redrawing a tile whose numbers did not
+# change costs only a dictionary lookup and a blit.
+
+from collections import OrderedDict
+
+
+class TextCache:
+    # An object in this class holds the fonts and a bounded LRU cache of
+    # rendered text surfaces.
+
+    def __init__(self, max_size=2048):
+        # Initialize an empty cache.
+        # - max_size is the number of text surfaces kept before the least
+        #   recently used one is evicted
+        self.max_size = max_size
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        # Return the default font of the given size, built on first use.
+        font = self.fonts.get(size)
+        if font is None:
+            import pygame
+
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.SysFont(None, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, colour, size):
+        # Return the surface of text rendered in colour (a pygame colour
+        # name) with the font of the given size.
+        key = (text, colour, size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        import pygame
+
+        self.misses += 1
+        surface = self.font(size).render(text, True, pygame.Color(colour))
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        # Drop the fonts and every cached surface (e.g. after pygame.quit).
+        self.fonts.clear()
+        self.surfaces.clear()
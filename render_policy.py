@@ -0,0 +1,65 @@
+"""
+Render throttling for the solvers.
+
+A RenderPolicy decides, independently of the solver progress, whether a
+sweep / environment step should be drawn:
+    - every k sweeps or steps (every=k);
+    - at most F frames per second of wall time (max_fps=F);
+    - only at the end of the run (final_only=True).
+The solvers only draw (and pause) when should_render says so. On the skipped
+frames they still pump the window events, at most every events_interval
+seconds (should_pump_events), so the window stays responsive.
+"""
+import time
+
+
+class RenderPolicy():
+    def __init__(self, every=1, max_fps=None, final_only=False, events_interval=0.05):
+        """
+        Initialize the render policy (the default draws every sweep/step, as before).
+
+        Args:
+            every (int): render one sweep/step out of `every`
+            max_fps (float): maximum number of frames per second of wall time (no limit if None)
+            final_only (bool): render only the final frame of the run
+            events_interval (float): minimum wall time between two event pumps of the skipped frames, in seconds
+        """
+        self.every = max(1, int(every))
+        self.max_fps = max_fps
+        self.final_only = final_only
+        self.events_interval = events_interval
+
+        self.calls = 0
+        self.frames = 0
+        self.last_frame_time = None
+        self.last_events_time = time.perf_counter()
+
+    def should_render(self, final=False):
+        """
+        Called once per sweep/step. Returns True if this one should be drawn.
+
+        Args:
+            final (bool): True for the last frame of the run, which is always drawn
+        """
+        self.calls += 1
+        if not final:
+            if self.final_only or self.calls % self.every != 0:
+                return False
+            if self.max_fps and self.last_frame_time is not None:
+                if time.perf_counter() - self.last_frame_time < 1 / self.max_fps:
+                    return False
+
+        self.frames += 1
+        self.last_frame_time = self.last_events_time = time.perf_counter()
+        return True
+
+    def should_pump_events(self):
+        """
+        Called on the skipped frames. Returns True if the window events are due
+        (events_interval seconds since the last pump or drawn frame).
+        """
+        now = time.perf_counter()
+        if now - self.last_events_time < self.events_interval:
+            return False
+        self.last_events_time = now
+        return True
@@ -0,0 +1,115 @@
+"""
+Experience storage for Dyna-Q planning, backed by preallocated NumPy arrays.
+
+We are assuming tabular transitions (s, a, r, s') where s and s' are StateSpace
+indices. Nothing is allocated per transition:
+    - ReplayBuffer is a ring buffer of the last `capacity` real transitions;
+    - TabularModel keeps the last observed outcome of every (s, a) pair (the
+      Gridworld is deterministic), and the list of the pairs observed so far.
+Both sample batches of transitions as arrays, ready for Q_learning.batched_update.
+"""
+import numpy as np
+
+
+class ReplayBuffer():
+    def __init__(self, capacity):
+        """
+        Allocates the ring buffer.
+
+        Args:
+            capacity (int): number of transitions kept, the oldest ones are overwritten
+        """
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.position = 0  # slot of the next transition
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state):
+        """
+        Stores one transition.
+        """
+        self.states[self.position] = state
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states):
+        """
+        Stores a batch of transitions (arrays of shape (N,)), e.g. one step of BatchGridWorld.
+        """
+        slots = (self.position + np.arange(len(states))) % self.capacity
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.position = (self.position + len(states)) % self.capacity
+        self.size = min(self.size + len(states), self.capacity)
+
+    def sample(self, batch_size):
+        """
+        Draws batch_size stored transitions uniformly (with replacement).
+
+        Returns:
+            states, actions, rewards, next_states (arrays): (batch_size,) arrays
+        """
+        slots = np.random.randint(self.size, size=batch_size)
+        return self.states[slots], self.actions[slots], self.rewards[slots], self.next_states[slots]
+
+
+class TabularModel():
+    def __init__(self, num_states, num_actions):
+        """
+        Allocates the (S, A) model tables.
+
+        Args:
+            num_states (int): number S of states
+            num_actions (int): number A of actions
+        """
+        self.num_actions = num_actions
+        self.next_states = np.full((num_states, num_actions), -1, dtype=np.int64)
+        self.rewards = np.zeros((num_states, num_actions), dtype=np.float64)
+        self.pairs = np.zeros(num_states * num_actions, dtype=np.int64)  # flat s * A + a of the observed pairs
+        self.num_pairs = 0
+
+    def __len__(self):
+        return self.num_pairs
+
+    def add(self, state, action, reward, next_state):
+        """
+        Records the outcome of one transition.
+        """
+        if self.next_states[state, action] < 0:
+            self.pairs[self.num_pairs] = state * self.num_actions + action
+            self.num_pairs += 1
+        self.next_states[state, action] = next_state
+        self.rewards[state, action] = reward
+
+    def add_batch(self, states, actions, rewards, next_states):
+        """
+        Records the outcomes of a batch of transitions (arrays of shape (N,)).
+        """
+        pairs = np.unique(states * self.num_actions + actions)
+        new_pairs = pairs[self.next_states.reshape(-1)[pairs] < 0]
+        self.pairs[self.num_pairs:self.num_pairs + new_pairs.size] = new_pairs
+        self.num_pairs += new_pairs.size
+        self.next_states[states, actions] = next_states
+        self.rewards[states, actions] = rewards
+
+    def sample(self, batch_size):
+        """
+        Draws batch_size observed (s, a) pairs uniformly and returns their modelled transitions.
+
+        Returns:
+            states, actions, rewards, next_states (arrays): (batch_size,) arrays
+        """
+        pairs = self.pairs[np.random.randint(self.num_pairs, size=batch_size)]
+        states, actions = np.divmod(pairs, self.num_actions)
+        return states, actions, self.rewards[states, actions], self.next_states[states, actions]
@@ -0,0 +1,208 @@
+"""
+Sparse-matrix Policy Iteration backend for very large Gridworld boards (needs scipy).
+
+We are assuming that:
+    - wall cells are removed from the state space: a move into a wall (or outside
+      the grid) leaves the agent in the same cell and gives reward_wall (resp. the
+      reward of the current cell);
+    - only the cells reachable from start_coord are kept as states;
+    - the reward of a transition is the reward of the cell we land in;
+    - the goal is a terminal state, its value function is always 0;
+    - the policy is uniform over a set of best actions (all actions at first).
+
+Memory grows with the number S of reachable states: the S*A x S transition matrix
+has one entry per (state, action), instead of dense (H, W) / (H, W, A) arrays.
+"""
+import numpy as np
+from batch_gridworld import ACTION_DELTAS
+from state_space import StateSpace
+
+try:
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import breadth_first_order
+except ImportError:
+    sp = None
+
+
+class SparsePolicyIteration():
+    def __init__(self, board_size, walls, start_coord, goal_coord, reward_goal, reward_wall, reward_empty, gamma, theta, v0_val=0):
+        """
+        Compiles the board into sparse transition and reward matrices over its reachable states.
+
+        Args:
+            board_size (tuple): (height, width) of the grid
+            walls (array): list of [x, y] wall coords, or boolean occupancy grid of shape board_size
+            start_coord (tuple): Coordinates (X,Y) of the start, used to find the reachable states
+            goal_coord (tuple): Coordinates (X,Y) of the goal/target
+            reward_goal (float): reward for landing on the goal
+            reward_wall (float): reward for bumping into a wall
+            reward_empty (float): reward for landing on an empty cell
+            gamma (float): gamma parameter (between 0 and 1)
+            theta (float): threshold parameter that defines when the change in the value function is negligible
+            v0_val (float): initial value for the value function
+        """
+        if sp is None:
+            raise ImportError("SparsePolicyIteration needs scipy (pip install scipy)")
+
+        self.board_size = list(board_size)
+        self.start_coord = list(start_coord)
+        self.goal_coord = list(goal_coord)
+        self.reward_goal = reward_goal
+        self.reward_wall = reward_wall
+        self.reward_empty = reward_empty
+        self.gamma = gamma
+        self.theta = theta
+        self.v0_val = v0_val
+
+        self.compile(StateSpace.wall_grid(self.board_size, walls))
+
+        self.v = np.full(self.num_states, float(v0_val))
+        self.v[self.terminal] = 0
+        self.best_actions = np.ones((self.num_states, self.num_actions), dtype=bool)
+
+    def compile(self, walls):
+        """
+        Builds the S*A x S transition matrix P and the (S, A) reward array R.
+        Row s * A + a of P holds the next state of taking action a in state s.
+
+        Args:
+            walls (array): boolean occupancy grid of shape board_size
+        """
+        board_height, board_width = self.board_size
+        num_actions = len(ACTION_DELTAS)
+
+        # Index the free cells
+        free_space = StateSpace(self.board_size, walls)
+        free_cells = free_space.coords[:, 0] * board_width + free_space.coords[:, 1]
+        cell_index = free_space.index.reshape(-1)
+        del free_space
+        start = cell_index[self.start_coord[0] * board_width + self.start_coord[1]]
+        goal = cell_index[self.goal_coord[0] * board_width + self.goal_coord[1]]
+
+        # Next free cell of each (free cell, action), built one action at a time to bound memory
+        xs, ys = np.divmod(free_cells.astype(np.int32), np.int32(board_width))
+        own_index = np.arange(free_cells.size, dtype=np.int32)
+        next_free = np.empty((free_cells.size, num_actions), dtype=np.int32)
+        bumped = np.empty((free_cells.size, num_actions), dtype=bool)
+        for a, (dx, dy) in enumerate(ACTION_DELTAS):
+            next_x = xs + dx
+            next_y = ys + dy
+            inside = (next_x >= 0) & (next_x < board_height) & (next_y >= 0) & (next_y < board_width)
+            target = cell_index[np.where(inside, next_x * board_width + next_y, free_cells)]
+            bumped[:, a] = target < 0
+            next_free[:, a] = np.where(bumped[:, a], own_index, target)
+        del xs, ys, cell_index
+
+        # Keep the states reachable from the start only
+        graph = sp.csr_matrix(
+            (np.ones(next_free.size, dtype=np.int8), next_free.reshape(-1), np.arange(0, next_free.size + 1, num_actions)),
+            shape=(free_cells.size, free_cells.size),
+        )
+        reachable = np.sort(breadth_first_order(graph, start, return_predecessors=False))
+        del graph
+
+        state_index = np.full(free_cells.size, -1, dtype=np.int32)
+        state_index[reachable] = np.arange(reachable.size, dtype=np.int32)
+
+        self.cells = free_cells[reachable]
+        self.num_states = reachable.size
+        self.num_actions = num_actions
+        next_state = state_index[next_free[reachable]]
+        bumped = bumped[reachable]
+
+        self.terminal = np.zeros(self.num_states, dtype=bool)
+        if goal >= 0 and state_index[goal] >= 0:
+            self.terminal[state_index[goal]] = True
+
+        self.R = np.where(bumped, self.reward_wall, self.reward_empty).astype(np.float64)
+        self.R[self.terminal[next_state] & ~bumped] = self.reward_goal
+
+        self.P = sp.csr_matrix(
+            (np.ones(next_state.size), next_state.reshape(-1), np.arange(next_state.size + 1)),
+            shape=(self.num_states * num_actions, self.num_states),
+        )
+
+    def policy_matrix(self):
+        """
+        Returns the transition matrix P_pi and the expected reward r_pi of the current policy.
+        """
+        weights = self.best_actions / self.best_actions.sum(axis=1, keepdims=True)
+        weights[self.terminal] = 0
+
+        # G sums the rows of P of each state, weighted by pi(a|s)
+        G = sp.csr_matrix(
+            (weights.reshape(-1), np.arange(weights.size), np.arange(0, weights.size + 1, self.num_actions)),
+            shape=(self.num_states, self.num_states * self.num_actions),
+        )
+        return (G @ self.P).tocsr(), (weights * self.R).sum(axis=1)
+
+    def policy_evaluation(self):
+        """
+        Applies the policy evaluation algorithm with sparse matrix-vector products.
+
+        Returns:
+            iter (int): number of sweeps
+        """
+        P_pi, r_pi = self.policy_matrix()
+        delta = self.theta + 1
+        iter = 0
+
+        while delta >= self.theta:
+            new_v = r_pi + self.gamma * (P_pi @ self.v)
+            new_v[self.terminal] = 0
+            delta = np.max(np.abs(new_v - self.v))
+            self.v = new_v
+            iter += 1
+
+        return iter
+
+    def policy_improvement(self):
+        """
+        Applies the Policy Improvement step, Q = R + gamma * P v.
+
+        Returns:
+            policy_stable (bool): True if the set of best actions did not change
+        """
+        q = self.R + self.gamma * (self.P @ self.v).reshape(self.num_states, self.num_actions)
+        best_actions = q == q.max(axis=1, keepdims=True)
+        policy_stable = np.array_equal(best_actions, self.best_actions)
+        self.best_actions = best_actions
+        return policy_stable
+
+    def policy_iteration(self, max_iterations=None):
+        """
+        Runs the Policy Iteration algorithm (Policy Evaluation -> Policy Improvement -> ...).
+
+        Args:
+            max_iterations (int): stop after this many improvements even if the policy is not stable
+
+        Returns:
+            v (array): (S,) value function of the reachable states
+            best_actions (array): (S, A) boolean array of the best actions of each state
+        """
+        timesteps = 0
+        policy_stable = False
+
+        while not policy_stable and (max_iterations is None or timesteps < max_iterations):
+            timesteps += 1
+            sweeps = self.policy_evaluation()
+            policy_stable = self.policy_improvement()
+            print(f"Iteration {timesteps} of Policy Iteration algorithm: {sweeps} evaluation sweeps")
+
+        return self.v, self.best_actions
+
+    def to_grid(self, values=None, fill_value=np.nan):
+        """
+        Scatters per-state values back on a dense (H, W) grid, e.g. for display.
+
+        Args:
+            values (array): (S,) or (S, A) array (the value function if None)
+            fill_value (float): value of the wall and unreachable cells
+
+        Returns:
+            grid (array): (H, W) or (H, W, A) array
+        """
+        values = self.v if values is None else values
+        grid = np.full((self.board_size[0] * self.board_size[1],) + values.shape[1:], fill_value, dtype=np.result_type(values, type(fill_value)))
+        grid[self.cells] = values
+        return grid.reshape(tuple(self.board_size) + values.shape[1:])
@@ -0,0 +1,91 @@
+"""
+State space of a Gridworld board, shared by the environment, DP and Q-learning.
+
+We are assuming that:
+    - the states are the non-wall cells (x,y), numbered 0..S-1 in row-major order;
+    - index[x, y] is the state of the cell (x,y), -1 for a wall;
+    - coords[s] is the cell (x,y) of the state s.
+Indices are collision-free on any (non-square) grid, and tables sized by
+num_states have no rows for wall cells.
+"""
+import numpy as np
+
+
+def default_wall_coords(board_size, wall_coords):
+    """
+    Returns the wall coords of a board, with the same default wall as Grid_World when the list is empty.
+    """
+    if len(wall_coords) == 0:
+        return [[2, i] for i in range(board_size[1] - 1)]
+    return wall_coords
+
+
+class StateSpace():
+    def __init__(self, board_size, walls=None):
+        """
+        Precomputes the coord <-> index lookup arrays.
+
+        Args:
+            board_size (tuple): (height, width) of the grid
+            walls (array): list of [x, y] wall coords, or bool/uint8 occupancy grid of shape board_size (no walls if None)
+        """
+        self.board_size = list(board_size)
+        self.walls = self.wall_grid(board_size, walls)
+
+        self.coords = np.argwhere(~self.walls)
+        self.num_states = len(self.coords)
+
+        self.index = np.full(self.board_size, -1, dtype=np.int64)
+        self.index[self.coords[:, 0], self.coords[:, 1]] = np.arange(self.num_states)
+
+    @staticmethod
+    def wall_grid(board_size, walls):
+        """
+        Returns the boolean occupancy grid of a list of [x, y] wall coords, or of an
+        occupancy grid: a bool array, or a NumPy array of shape board_size of any dtype
+        (nonzero for a wall). Python lists are always read as coords.
+        """
+        if walls is None:
+            return np.zeros(board_size, dtype=bool)
+        is_grid = isinstance(walls, np.ndarray) and walls.shape == tuple(board_size)
+        walls = np.asarray(walls)
+        if walls.dtype == bool or is_grid:
+            return walls.astype(bool)
+        grid = np.zeros(board_size, dtype=bool)
+        if walls.size:
+            grid[walls[:, 0], walls[:, 1]] = True
+        return grid
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        State space of the non-wall cells of a Grid_World board.
+        """
+        return cls(board.board_size, board.walls)
+
+    @classmethod
+    def from_wall_sets(cls, board_size, wall_sets):
+        """
+        State space shared by several wall layouts of the same board (e.g. before and
+        after a wall change): only the cells that are walls in every layout are excluded.
+
+        Args:
+            board_size (tuple): (height, width) of the grid
+            wall_sets (list): list of wall coord lists or occupancy grids (Grid_World default wall if a list is empty)
+        """
+        walls = np.ones(board_size, dtype=bool)
+        for wall_coords in wall_sets:
+            walls &= cls.wall_grid(board_size, default_wall_coords(board_size, wall_coords))
+        return cls(board_size, walls)
+
+    def state_index(self, x, y):
+        """
+        Returns the state of the cell (x,y) (-1 for a wall).
+        """
+        return self.index[x, y]
+
+    def state_coords(self, s):
+        """
+        Returns the cell [x, y] of the state s.
+        """
+        return self.coords[s].tolist()
@@ -0,0 +1,208 @@
+"""
+Headless hyperparameter and seed sweep runner.
+
+Expands the grid of every --param value and every --seed, and runs each
+configuration of the strategy in a process pool (one worker per core by default).
+Every run is headless (surface=None) and writes its Episode_*/weights files in a
+temporary folder. One JSON record per finished run is appended to --output
+(JSON Lines), so a long sweep can be followed, and is not lost, while it runs.
+
+The defaults are those of main.py; any keyword argument of the strategy's
+solver class can be swept, values are Python literals (or plain strings).
+
+Usage:
+    python3 sweep.py qlearning_fast --param alpha 0.1 0.5 --param epsilon 0.05 0.1 --seeds 0 1 2 --output sweep.jsonl
+    python3 sweep.py value_iter --param gamma 0.9 0.99 --param theta 0.01 0.0001 --output sweep.jsonl
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ast
+import contextlib
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from policy_iteration import PolicyIteration
+from prioritized_sweeping import PrioritizedSweeping
+from q_learner import Q_learning
+from value_iteration import ValueIteration
+
+BOARD_SIZE = [10, 10]
+
+# Same settings as main.py
+Q_LEARNING_DEFAULTS = {
+    "alpha": 0.5,
+    "gamma": 0.95,
+    "lmbda": 0.0,
+    "epsilon": 0.1,
+    "num_episodes": 200,
+    "board_size": BOARD_SIZE,
+    "start_coord": (0, 0),
+    "original_wall": [[2, i] for i in range(BOARD_SIZE[1] - 1)],
+    "new_wall": [[2, i] for i in range(1, BOARD_SIZE[1])],
+    "pauseTime": 0,
+    "transition_timestep": 3000,
+    "final_epsilon": 0.01,
+    "anneal_epsilon_episodes": 10,
+    "epsilon_anneal_rate": None,
+}
+DP_DEFAULTS = {
+    "transition_timestep": 3000,
+    "board_size": BOARD_SIZE,
+    "start_coord": (0, 0),
+    "goal_coord": (5, 5),
+    "original_wall": [[2, i] for i in range(BOARD_SIZE[1] - 1)],
+    "new_wall": [[2, i] for i in range(1, BOARD_SIZE[1])],
+    "reward_goal": 10,
+    "reward_wall": -10,
+    "reward_empty": 0,
+    "pauseTime": 0,
+    "v0_val": 0,
+    "gamma": 0.9,
+    "theta": 0.01,
+    "seed": 42,
+}
+
+STRATEGIES = {
+    # name: (solver class, default arguments, method run)
+    "qlearning": (Q_learning, Q_LEARNING_DEFAULTS, "q_learning"),
+    "qlearning_batched": (Q_learning, Q_LEARNING_DEFAULTS, "batched_q_learning"),
+    "qlearning_fast": (Q_learning, Q_LEARNING_DEFAULTS, "fast_q_learning"),
+    "qlearning_prioritized": (PrioritizedSweeping, Q_LEARNING_DEFAULTS, "q_learning"),
+    "policy_iter": (PolicyIteration, DP_DEFAULTS, "policy_iteration"),
+    "value_iter": (ValueIteration, DP_DEFAULTS, "value_iteration"),
+}
+
+
+def parse_value(text):
+    """
+    Parses a swept value as a Python literal, or keeps it as a string (e.g. replacing).
+    """
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def expand_grid(params, seeds):
+    """
+    Returns the list of {name: value} configurations of the cartesian product of the
+    swept values, each one repeated for every seed (under the "seed" key).
+    """
+    names = list(params)
+    configs = []
+    for values in itertools.product(*(params[name] for name in names)):
+        for seed in seeds:
+            config = dict(zip(names, values))
+            config["seed"] = seed
+            configs.append(config)
+    return configs
+
+
+def q_learning_metrics(returns, lengths):
+    tail = max(1, len(lengths) // 10)
+    return {
+        "episodes": len(lengths),
+        "total_timesteps": int(np.sum(lengths)),
+        "mean_return": float(np.mean(returns)),
+        "final_mean_length": float(np.mean(lengths[-tail:])),  # over the last 10% of the episodes
+    }
+
+
+def dp_metrics(agent, v):
+    return {"start_value": float(v[agent.start_coord[0], agent.start_coord[1]])}
+
+
+def warm_up_worker(strategy):
+    """
+    Pool initializer: compiles (or loads from cache) the episode kernel once per worker
+    process, so that the elapsed_s of the worker's first run does not include it.
+    """
+    if STRATEGIES[strategy][2] != "fast_q_learning":
+        return
+    from episode_kernel import run_episodes
+
+    # Two states, every action of the start state leads to the goal
+    next_state = np.ones((2, 4), dtype=np.int64)
+    run_episodes(np.zeros((2, 4)), next_state, 0, 1, 0, 0.0, 0, 0.0,
+                 0.5, 0.95, np.full(1, 0.1), np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros(1),
+                 np.zeros(1, dtype=np.int64), np.zeros(1), 0)
+
+
+def run_config(strategy, config):
+    """
+    Runs one configuration headless (in a worker process) and returns its record.
+    """
+    solver_class, defaults, method = STRATEGIES[strategy]
+    kwargs = dict(defaults)
+    kwargs.update(config)
+    record = {"strategy": strategy, "params": config}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if solver_class in (PolicyIteration, ValueIteration):
+                    agent = solver_class(surface=None, **kwargs)
+                    v, pi = getattr(agent, method)()
+                    record.update(dp_metrics(agent, v))
+                else:
+                    np.random.seed(kwargs.pop("seed"))
+                    agent = solver_class(surface=None, **kwargs)
+                    returns, lengths = getattr(agent, method)()
+                    record.update(q_learning_metrics(returns, lengths))
+            record["elapsed_s"] = time.perf_counter() - start
+        except Exception as error:
+            record["error"] = f"{type(error).__name__}: {error}"
+        finally:
+            os.chdir(cwd)
+    return record
+
+
+def run(strategy, configs, output, workers=None):
+    """
+    Fans the configurations out to a pool of workers (one per core if None, each one
+    warmed up by warm_up_worker) and appends each record to the output file as soon
+    as its run finishes.
+
+    Returns:
+        num_errors (int): number of runs that raised
+    """
+    num_errors = 0
+    with open(output, "a") as f, ProcessPoolExecutor(max_workers=workers, initializer=warm_up_worker, initargs=(strategy,)) as pool:
+        futures = [pool.submit(run_config, strategy, config) for config in configs]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            num_errors += "error" in record
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            print(f"[{done}/{len(configs)}] {record}")
+    return num_errors
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(dest="strategy", choices=list(STRATEGIES), help="Strategy to sweep.")
+    parser.add_argument("--param", nargs="+", action="append", default=[], metavar=("NAME", "VALUE"), help="Solver argument NAME swept over the VALUEs (Python literals). Repeat for a grid.")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0], help="Seeds every configuration is run with.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (one per core by default).")
+    parser.add_argument("--output", default="sweep_results.jsonl", help="Output JSON Lines file (records are appended).")
+    args = parser.parse_args()
+
+    params = {}
+    for name, *values in args.param:
+        if not values:
+            parser.error(f"--param {name} needs at least one value")
+        params[name] = [parse_value(value) for value in values]
+
+    configs = expand_grid(params, args.seeds)
+    print(f"Running {len(configs)} configurations of {args.strategy} on {args.workers or os.cpu_count()} workers")
+    num_errors = run(args.strategy, configs, args.output, args.workers)
+    print(f"Results appended to {args.output} ({num_errors} failed runs)")
@@ -0,0 +1,55 @@
+import numpy as np
+
+from batch_gridworld import BatchGridWorld
+from gridworld import Grid_World
+
+UP, DOWN, RIGHT, LEFT = range(4)
+# One wall out of the way (an empty list means the default wall)
+FAR_WALL = [[4, 0]]
+
+
+def test_step_moves_back_into_row_0():
+    board = Grid_World(None, (5, 5), FAR_WALL, (1, 2), (4, 4))
+    board.step(UP)
+    assert board.position == [0, 2]
+
+
+def test_step_moves_back_into_column_0():
+    board = Grid_World(None, (5, 5), FAR_WALL, (2, 1), (4, 4))
+    board.step(LEFT)
+    assert board.position == [2, 0]
+
+
+def test_step_stays_inside_the_grid():
+    board = Grid_World(None, (5, 5), FAR_WALL, (0, 0), (4, 4))
+    board.step(UP)
+    board.step(LEFT)
+    assert board.position == [0, 0]
+
+
+def test_step_stops_at_walls():
+    board = Grid_World(None, (5, 5), [[0, 2], [2, 0]], (1, 2), (4, 4))
+    board.step(UP)
+    assert board.position == [1, 2]
+    board.position = [2, 1]
+    board.step(LEFT)
+    assert board.position == [2, 1]
+
+
+def test_batch_step_matches_grid_world():
+    walls = [[2, i] for i in range(1, 5)]
+    env = BatchGridWorld((5, 5), walls, (3, 0), (4, 4), num_envs=1)
+    board = Grid_World(None, (5, 5), walls, (3, 0), (4, 4))
+    for action in [UP, UP, UP, LEFT, RIGHT, UP, DOWN, DOWN, DOWN, LEFT]:
+        env.step(np.array([action]))
+        board.step(action)
+        assert env.positions[0].tolist() == board.position
+
+
+def test_headless_board_updates():
+    board = Grid_World(None, (5, 5), FAR_WALL, (0, 0), (4, 4))
+    board.update_value_function(np.ones((5, 5)))
+    board.update_optimal_actions(np.full((5, 5), "up_arrow", dtype=object))
+    board.instanciate_rewards_list()
+    assert board.tiles is None
+    assert len(board.board) == 5
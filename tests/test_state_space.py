@@ -0,0 +1,31 @@
+import numpy as np
+
+from state_space import StateSpace
+
+
+def test_wall_grid_from_coords():
+    grid = StateSpace.wall_grid((3, 4), [[0, 1], [2, 3]])
+    assert grid.dtype == bool
+    assert np.argwhere(grid).tolist() == [[0, 1], [2, 3]]
+
+
+def test_wall_grid_from_int_grid():
+    for dtype in (np.int64, np.int32, np.uint8, np.float64):
+        walls = np.zeros((3, 4), dtype=dtype)
+        walls[0, 1] = walls[2, 3] = 1
+        grid = StateSpace.wall_grid((3, 4), walls)
+        assert np.argwhere(grid).tolist() == [[0, 1], [2, 3]]
+
+
+def test_wall_grid_coords_list_of_board_shape():
+    # A coords list shaped like the board is still read as coords
+    grid = StateSpace.wall_grid((2, 2), [[0, 1], [1, 0]])
+    assert np.argwhere(grid).tolist() == [[0, 1], [1, 0]]
+
+
+def test_state_space_from_int_grid():
+    walls = np.zeros((3, 3), dtype=int)
+    walls[1, 1] = 1
+    space = StateSpace((3, 3), walls)
+    assert space.num_states == 8
+    assert space.index[1, 1] < 0
@@ -1,2 +1,154 @@
+"""
+Value Iteration algorithm for Gridworld problem.
 
-#class ValueIter()
\ No newline at end of file
+We are assuming that:
+    - we start from the initial value function v0 (0 on the terminal state);
+    - when the action send us to a cell outside the grid, we will stay in the same cell;
+    - the optimal policy is the greedy policy w.r.t. the converged value function.
+"""
+import numpy as np
+import checkpoint
+from gridworld import Grid_World
+from mdp import compile_mdp
+from policy_iteration import PolicyIteration
+
+class ValueIteration(PolicyIteration):
+    def __init__(self, surface,transition_timestep,board_size,start_coord,goal_coord,original_wall,new_wall,reward_goal,reward_wall,reward_empty,pauseTime, v0_val, gamma, theta, seed, gauss_seidel=False, render_policy=None, checkpoint_path=None, checkpoint_every=1, profiler=None, snapshots=None):
+        """
+        Initialize our ValueIteration class (same arguments as PolicyIteration).
+
+        Args:
+            gauss_seidel (bool): update the value function in place, state after state, instead of one synchronous whole-array backup per sweep
+            render_policy (RenderPolicy): which sweeps are drawn (every sweep if None)
+            checkpoint_path (str): checkpoint directory written during the run (none if None)
+            checkpoint_every (int): number of sweeps between two checkpoints
+            profiler (Profiler): phase timers and counters of the run (disabled if None)
+            snapshots (SnapshotBuffer): publish the frames there for a UI thread instead of drawing them (run headless)
+        """
+        super().__init__(surface,transition_timestep,board_size,start_coord,goal_coord,original_wall,new_wall,reward_goal,reward_wall,reward_empty,pauseTime, v0_val, gamma, theta, seed, render_policy=render_policy, checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every, profiler=profiler, snapshots=snapshots)
+        self.gauss_seidel = gauss_seidel
+
+    def value_iteration(self, resume=False):
+        """
+        Runs the Value Iteration algorithm:
+            - Bellman optimality backups until the value function converges
+            - Greedy policy extraction
+
+        Args:
+            resume (bool): start from the checkpoint at checkpoint_path, if there is one
+        """
+        board = Grid_World(self.surface, self.board_size, self.original_wall,self.start_coord,self.goal_coord,self.reward_goal,self.reward_wall,self.reward_empty)
+
+        #Instantiate rewards list
+        board.instanciate_rewards_list()
+
+        # Compile transition and reward tables once for all sweeps
+        with self.profiler.phase("compile_mdp"):
+            self.mdp = compile_mdp(board)
+
+        # Import board metrics
+        board_height = board.board_size[0]
+        board_width = board.board_size[1]
+
+        delta = self.theta + 1
+        iter = 0
+
+        # Generate initial value function and policy, or resume from the last checkpoint
+        if resume and self.checkpoint_path is not None and checkpoint.checkpoint_exists(self.checkpoint_path):
+            iter = self.load_checkpoint(self.checkpoint_path)["sweeps"]
+            print(f"\nResuming Value Iteration from sweep {iter + 1}")
+        else:
+            self.v = self.get_init_v(board_height,board_width, self.v0_val, board.goal_coord)
+            self.pi,self.optimal_actions = self.get_equiprobable_policy(board_height,board_width,board.actions)
+
+        # Send initial value function and policy to grid
+        self.render(board)
+
+        while delta >= self.theta:
+            # Handle events
+            with self.profiler.phase("events"):
+                board.handle_events()
+
+            with self.profiler.phase("bellman_sweep"):
+                if self.gauss_seidel:
+                    delta = self.gauss_seidel_sweep(self.v, self.gamma)
+                else:
+                    delta = self.bellman_optimality_sweep(self.v, self.gamma)
+            self.profiler.count("sweeps")
+            self.profiler.count("backups", self.v.size)
+
+            # Send new value function to grid
+            self.render(board)
+
+            iter += 1
+
+            if self.checkpoint_path is not None and iter % self.checkpoint_every == 0:
+                with self.profiler.phase("checkpoint"):
+                    self.save_checkpoint(self.checkpoint_path, {"sweeps": iter})
+
+        print(f"\nValue function converged: the Value Iteration algorithm converged after {iter} sweeps")
+
+        ############ Greedy Policy Extraction ############
+        self.extract_policy(board, self.v, self.pi, self.gamma)
+
+        # Always show the final value function and policy
+        self.render(board, final=True)
+
+        return self.v, self.pi
+
+    def bellman_optimality_sweep(self, v, gamma):
+        """
+        Applies the Bellman optimality update v(s) = max_a [r(s,a) + gamma * v(s')] to every state at once.
+
+        Args:
+            v (array): numpy array representing the value function, updated in place
+            gamma (float): gamma parameter (between 0 and 1)
+
+        Returns:
+            delta (float): maximum change of the value function over all states
+        """
+        flat_v = v.reshape(-1)
+        new_v = self.mdp.action_values(flat_v, gamma).max(axis=1)
+
+        # The value function on the terminal state always has value 0
+        new_v[self.mdp.terminal] = flat_v[self.mdp.terminal]
+
+        delta = np.max(np.abs(new_v - flat_v))
+        v[:] = new_v.reshape(v.shape)
+        return delta
+
+    def gauss_seidel_sweep(self, v, gamma):
+        """
+        Applies the Bellman optimality update in place, state after state, so that
+        each backup already uses the values updated earlier in the same sweep.
+
+        Args:
+            v (array): numpy array representing the value function, updated in place
+            gamma (float): gamma parameter (between 0 and 1)
+
+        Returns:
+            delta (float): maximum change of the value function over all states
+        """
+        flat_v = v.reshape(-1)
+        next_state = self.mdp.next_state
+        rewards = self.mdp.rewards
+        delta = 0
+
+        for s in np.flatnonzero(~self.mdp.terminal):
+            old_value = flat_v[s]
+            flat_v[s] = np.max(rewards[s] + gamma * flat_v[next_state[s]])
+            delta = max(delta, abs(old_value - flat_v[s]))
+
+        return delta
+
+    def extract_policy(self, board, v, pi, gamma):
+        """
+        Extracts the greedy policy w.r.t. the value function (uniform over tied best actions).
+
+        Args:
+            board (Environment): gridworld environment
+            v (array): numpy array representing the value function
+            pi (array): numpy array representing the policy, updated in place
+            gamma (float): gamma parameter (between 0 and 1)
+        """
+        return self.policy_improvement(board, v, pi, gamma)